@@ -1,4 +1,11 @@
-from timeit import timeit
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tracemalloc
+from timeit import Timer, repeat, timeit
+import enumap
 from enumap import SparseEnumap, Enumap
 from collections import namedtuple, OrderedDict
 
@@ -97,6 +104,14 @@ def test_smallish_sparse_map():
         globals=dict(data=incomplete_data, spec=sparse_spec),
         number=N_RUNS)
 
+    # time Enumap.map() when it's set to make plain dicts
+    dict_spec = Enumap("ThingDict", spec.names())
+    dict_spec.set_map_factory(dict)
+    enumap_dict_map_time = timeit(
+        "spec.map(*data)",
+        globals=dict(data=data, spec=dict_spec),
+        number=N_RUNS)
+
     # time a regular dict(zip(...)) call
     regular_dict_time = timeit(
         "dict(zip(spec.names(), data))",
@@ -113,6 +128,7 @@ def test_smallish_sparse_map():
     print(f"{'Enumap.map (with kwargs)':<40} {enumap_kwargs_map_time:.2f}")
     print(f"{'Enumap.map (with override)':<40} {enumap_override_map_time:.2f}")
     print(f"{'Enumap.map (sparse)':<40} {enumap_sparse_map_time:.2f}")
+    print(f"{'Enumap.map (dict factory)':<40} {enumap_dict_map_time:.2f}")
     print(f"{'dict':<40} {regular_dict_time:.2f}")
     print(f"{'OrderedDict':<40} {ordered_dict_time:.2f}")
 
@@ -126,6 +142,9 @@ def test_smallish_casted_tuple():
     spec.set_types(a=int, e=int)
     sparse_typeless_spec = SparseEnumap(
         "ThingSparseTypless", "a b c d e f g h i j k")
+    # casts every member like the namedtuple(*map(int, ...)) baseline
+    int_spec = Enumap("ThingInts", spec.names())
+    int_spec.set_types(*[int] * len(data))
 
     print()
     print(spec.tuple_casted(*data))
@@ -164,6 +183,19 @@ def test_smallish_casted_tuple():
         globals=dict(data=incomplete_data, spec=sparse_typeless_spec),
         number=N_RUNS)
 
+    # time Enumap.tuple_casted() when every member is typed int
+    enumap_int_tuple_time = timeit(
+        "spec.tuple_casted(*data)",
+        globals=dict(data=data, spec=int_spec),
+        number=N_RUNS)
+
+    # time Enumap.tuples(casted=True) over a batch of complete rows
+    rows = [data] * N_RUNS
+    enumap_bulk_tuple_time = timeit(
+        "spec.tuples(rows, casted=True, lazy=False)",
+        globals=dict(rows=rows, spec=int_spec),
+        number=1)
+
     # time a regular tuple(iterable) call
     regular_tuple_time = timeit("tuple(map(int, data))",
                                 globals=dict(data=data),
@@ -175,10 +207,344 @@ def test_smallish_casted_tuple():
                               globals=dict(data=data, ntuple=ntuple),
                               number=N_RUNS)
 
-    print(f"{'Enumap.tuple_casted':<40} {enumap_tuple_time:.2f}")
-    print(f"{'Enumap.tuple_casted (with kwargs)':<40} {enumap_kwargs_tuple_time:.2f}")
-    print(f"{'Enumap.tuple_casted (with override)':<40} {enumap_override_tuple_time:.2f}")
-    print(f"{'Enumap.tuple_casted (sparse)':<40} {enumap_sparse_tuple_time:.2f}")
-    print(f"{'Enumap.tuple_casted (sparse, typeless)':<40} {enumap_sparse_typeless_tuple_time:.2f}")
-    print(f"{'tuple(map(int, ...))':<40} {regular_tuple_time:.2f}")
-    print(f"{'namedtuple(map(int, ...))':<40} {named_tuple_time:.2f}")
+    # report each time; the ones that cast all 11 values like the
+    # namedtuple(*map(int, ...)) baseline also get their slowdown
+    results = [
+        ("Enumap.tuple_casted (2 typed)", enumap_tuple_time, False),
+        ("Enumap.tuple_casted (with kwargs)", enumap_kwargs_tuple_time,
+         False),
+        ("Enumap.tuple_casted (with override)", enumap_override_tuple_time,
+         False),
+        ("Enumap.tuple_casted (sparse)", enumap_sparse_tuple_time, False),
+        ("Enumap.tuple_casted (sparse, typeless)",
+         enumap_sparse_typeless_tuple_time, False),
+        ("Enumap.tuple_casted (all typed)", enumap_int_tuple_time, True),
+        ("Enumap.tuples (all typed, bulk)", enumap_bulk_tuple_time, True),
+        ("tuple(map(int, ...))", regular_tuple_time, True),
+        ("namedtuple(map(int, ...))", named_tuple_time, True),
+    ]
+    for name, run_time, comparable in results:
+        slowdown = (f" ({run_time / named_tuple_time:.1f}x namedtuple)"
+                    if comparable else "")
+        print(f"{name:<40} {run_time:.2f}{slowdown}")
+
+
+def _allocated_bytes(make, n_objects):
+    """Bytes allocated for `n_objects` made by calling `make`"""
+    tracemalloc.start()
+    objects = [make() for _ in range(n_objects)]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return allocated
+
+
+def test_smallish_records():
+    data = "1 2 3 4 5 6 7 8 9 10 11".split()
+    spec = Enumap("Thing", "a b c d e f g h i j k")
+    sparse_spec = SparseEnumap("ThingSparse", spec.names())
+    incomplete_data = data[:-6]
+
+    print()
+    print(spec.record(*data))
+    print(sparse_spec.record(*incomplete_data))
+
+    results = []
+    for method in ("record", "tuple", "map"):
+        run_time = timeit(
+            f"spec.{method}(*data)",
+            globals=dict(data=data, spec=spec),
+            number=N_RUNS)
+        sparse_run_time = timeit(
+            f"spec.{method}(*data)",
+            globals=dict(data=incomplete_data, spec=sparse_spec),
+            number=N_RUNS)
+        make = getattr(spec, method)
+        n_bytes = _allocated_bytes(lambda: make(*data), 10_000)
+        results.append((method, run_time, sparse_run_time, n_bytes))
+
+    for method, run_time, sparse_run_time, n_bytes in results:
+        print(f"{'Enumap.' + method:<40} {run_time:.2f}")
+        print(f"{'Enumap.' + method + ' (sparse)':<40} "
+              f"{sparse_run_time:.2f}")
+        print(f"{'Enumap.' + method + ' (bytes per object)':<40} "
+              f"{n_bytes / 10_000:.0f}")
+
+
+def _python_startup_time(statement, n_runs=5):
+    """Best wall time of a fresh interpreter running `statement`"""
+    return min(timeit(
+        lambda: subprocess.run([sys.executable, "-c", statement], check=True),
+        number=1) for _ in range(n_runs))
+
+
+def _define_specs(n_specs, n_members):
+    names = [f"m{i}" for i in range(n_members)]
+    for i in range(n_specs):
+        spec = SparseEnumap(f"Spec{i}", names)
+        spec.set_types(*([int] * n_members))
+        spec.set_defaults(*range(n_members))
+
+
+def test_spec_creation():
+    bare_time = _python_startup_time("pass")
+    import_time = _python_startup_time("import enumap")
+
+    print()
+    print(f"{'import enumap':<40} {(import_time - bare_time) * 1000:.1f}ms")
+    for n_specs, n_members in ((100, 5), (100, 50), (500, 10)):
+        run_time = timeit(
+            lambda: _define_specs(n_specs, n_members), number=3) / 3
+        label = f"{n_specs} specs x {n_members} members"
+        print(f"{label:<40} {run_time * 1000:.1f}ms")
+
+
+def test_interned_records():
+    hosts = [f"web{i}.example.com" for i in range(20)]
+    statuses = ["ok", "redirect", "not_found", "error"]
+    lines = [f"{hosts[i % 20]} {statuses[i % 4]} {i}"
+             for i in range(100_000)]
+    spec = Enumap("Hit", "host status size")
+    spec.set_types(size=int)
+    interned_spec = Enumap("InternedHit", spec.names())
+    interned_spec.set_types(size=int)
+    interned_spec.set_interned("host", "status")
+
+    print()
+    results = []
+    for label, hit_spec in (("Enumap.tuples", spec),
+                            ("Enumap.tuples (interned)", interned_spec)):
+        tracemalloc.start()
+        hits = list(hit_spec.tuples((line.split() for line in lines),
+                                    casted=True))
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del hits
+        results.append(allocated)
+        print(f"{label + ' (MB per 100k)':<40} {allocated / 1e6:.1f}")
+    saved = 1 - results[1] / results[0]
+    print(f"{'interning memory savings':<40} {saved:.0%}")
+
+
+def test_jsonl():
+    spec = Enumap("Thing", "a b c d e f g h i j k")
+    records = [spec.tuple(*range(i, i + 6), *"vwxyz") for i in range(1000)]
+
+    print()
+    print(spec.dumps_jsonl(records[:1]), end="")
+    jsonl_time = timeit(
+        "spec.dumps_jsonl(records)",
+        globals=dict(spec=spec, records=records),
+        number=N_RUNS // 1000)
+    dict_time = timeit(
+        "''.join(json.dumps(r._asdict()) + '\\n' for r in records)",
+        globals=dict(json=json, records=records),
+        number=N_RUNS // 1000)
+    zip_time = timeit(
+        "''.join(json.dumps(dict(zip(names, r))) + '\\n' for r in records)",
+        globals=dict(json=json, names=spec.names(), records=records),
+        number=N_RUNS // 1000)
+    lines = spec.dumps_jsonl(records).splitlines()
+    loads_time = timeit(
+        "list(spec.loads_jsonl(lines))",
+        globals=dict(spec=spec, lines=lines),
+        number=N_RUNS // 1000)
+    print(f"{'Enumap.dumps_jsonl':<40} {jsonl_time:.2f}")
+    print(f"{'json.dumps(namedtuple._asdict())':<40} {dict_time:.2f}")
+    print(f"{'json.dumps(dict(zip(names, record)))':<40} {zip_time:.2f}")
+    print(f"{'Enumap.loads_jsonl':<40} {loads_time:.2f}")
+
+
+# Reproducible sweep, run as a script (see `python benchmark.py --help`).
+# Results are written as JSON and can be compared against a baseline file.
+
+SWEEP_PATHS = ("map", "tuple", "map_casted", "tuple_casted",
+               "sparse", "override")
+SWEEP_MEMBERS = (3, 10, 100, 1000)
+SWEEP_BATCH_SIZES = (1, 100, 1000)
+
+
+def _sweep_case(path, n_members, batch_size):
+    """Returns a function that makes `batch_size` records of an Enumap
+    with `n_members` through `path`"""
+    names = [f"m{i}" for i in range(n_members)]
+    row = tuple(str(i) for i in range(n_members))
+    if path == "sparse":
+        spec = SparseEnumap(f"Sparse{n_members}", names)
+        row = row[:n_members // 2]
+    else:
+        spec = Enumap(f"Spec{n_members}", names)
+    spec.set_types(*([int] * n_members))
+    rows = [row] * batch_size
+    if path == "override":
+        last = {names[-1]: "0"}
+        return lambda: [spec.tuple(*row, **last) for row in rows]
+    kind, _, casted = path.partition("_")
+    if kind == "sparse":
+        kind = "tuple"
+    if batch_size == 1:
+        make = getattr(spec, f"{kind}_casted" if casted else kind)
+        return lambda: make(*row)
+    make_many = getattr(spec, f"{kind}s")
+    return lambda: make_many(rows, casted=bool(casted), lazy=False)
+
+
+def _peak_bytes(run):
+    tracemalloc.start()
+    result = run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak
+
+
+def run_sweep(paths, members, batch_sizes, n_repeats=5):
+    """Times every combination of `paths`, member counts and batch sizes.
+    Each result has the best time per record of `n_repeats` runs and the
+    peak memory traced while making one batch."""
+    results = []
+    for path in paths:
+        for n_members in members:
+            for batch_size in batch_sizes:
+                run = _sweep_case(path, n_members, batch_size)
+                timer = Timer(run)
+                number, _ = timer.autorange()
+                best = min(timer.repeat(n_repeats, number)) / number
+                results.append(dict(
+                    path=path, members=n_members, batch_size=batch_size,
+                    seconds_per_record=best / batch_size,
+                    peak_bytes=_peak_bytes(run)))
+                print(f"{path:<14} {n_members:>5} members "
+                      f"{batch_size:>6} batch "
+                      f"{best / batch_size * 1e6:>10.3f}us/record "
+                      f"{results[-1]['peak_bytes']:>12,} bytes peak")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Returns a message for each result that's slower or uses more peak
+    memory than its baseline result by more than `threshold` (a ratio)"""
+    def key(result):
+        return result["path"], result["members"], result["batch_size"]
+    baseline_results = {key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        base = baseline_results.get(key(result))
+        if base is None:
+            continue
+        for metric in ("seconds_per_record", "peak_bytes"):
+            limit = base[metric] * (1 + threshold)
+            if base[metric] and result[metric] > limit:
+                change = result[metric] / base[metric] - 1
+                regressions.append(f"{'/'.join(map(str, key(result)))} "
+                                   f"{metric} {change:+.0%}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Sweep enumap constructors over member counts and "
+                    "batch sizes and compare against a baseline")
+    parser.add_argument("--paths", nargs="+", default=SWEEP_PATHS,
+                        choices=SWEEP_PATHS)
+    parser.add_argument("--members", nargs="+", type=int,
+                        default=SWEEP_MEMBERS)
+    parser.add_argument("--batch-sizes", nargs="+", type=int,
+                        default=SWEEP_BATCH_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="allowed slowdown ratio (default: 0.1)")
+    args = parser.parse_args(argv)
+
+    results = run_sweep(args.paths, args.members, args.batch_sizes,
+                        args.repeat)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(dict(enumap=enumap.__version__,
+                           python=platform.python_version(),
+                           results=results), output, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            baseline_results = json.load(baseline)["results"]
+        regressions = compare(results, baseline_results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+def test_wide_specs():
+    """Per-record cost divided by width should stay flat as specs widen.
+    The first call of each case compiles its constructor; that's
+    reported separately since it's paid on every cold start."""
+    print()
+    for width in (10, 100, 1000, 5000):
+        names = [f"f{i}" for i in range(width)]
+        row = tuple(str(i) for i in range(width))
+        spec = Enumap(f"Wide{width}", names)
+        spec.set_types(*([int] * width))
+        sparse_spec = SparseEnumap(f"WideSparse{width}", names)
+        cases = dict(
+            tuple=lambda: spec.tuple(*row),
+            tuple_casted=lambda: spec.tuple_casted(*row),
+            mapping_rows=lambda: spec.tuples(mapping_rows, lazy=False),
+            override=lambda: spec.tuple(*row[:-1], **{names[-1]: "0"}),
+            sparse=lambda: sparse_spec.tuple(*row[:5]))
+        mapping_rows = [dict(zip(names, row))]
+        n_runs = max(N_RUNS // width, 100)
+        for label, run in cases.items():
+            first_call_time = timeit(run, number=1)
+            run_time = min(repeat(run, number=n_runs, repeat=3))
+            ns_per_member = run_time / n_runs / width * 1e9
+            print(f"{f'{width} members {label}':<40} "
+                  f"{ns_per_member:.1f}ns per member, "
+                  f"first call {first_call_time * 1e3:.1f}ms")
+
+
+def test_sparse_keywords():
+    """Sparse records that give a few of many members by keyword"""
+    names = [f"f{i}" for i in range(40)]
+    sparse_spec = SparseEnumap("Feed", names)
+    sparse_spec.set_types(f3=int, f17=float)
+    given = dict(f3="3", f17="1.5", f30="x", f39="y")
+
+    print()
+    print(sparse_spec.tuple_casted(**given))
+    for method in ("tuple", "tuple_casted", "map", "record"):
+        run_time = timeit(
+            f"spec.{method}(**given)",
+            globals=dict(spec=sparse_spec, given=given),
+            number=N_RUNS)
+        print(f"{'SparseEnumap.' + method + ' (4 of 40 keys)':<40} "
+              f"{run_time:.2f}")
+
+
+def test_replace():
+    spec = Enumap("Thing", "a b c d e f g h i j k")
+    spec.set_types(*[int] * 11)
+    record = spec.tuple(*range(11))
+    records = [record] * 1000
+
+    print()
+    print(spec.replace(record, d="override"))
+    for label, statement in (
+            ("Enumap.replace", "spec.replace(record, d=0)"),
+            ("Enumap.tuple (with override)",
+             "spec.tuple(*record, d=0)"),
+            ("namedtuple._replace", "record._replace(d=0)"),
+            ("Enumap.replace_casted", "spec.replace_casted(record, d='0')"),
+            ("Enumap.tuple_casted (with override)",
+             "spec.tuple_casted(*record, d='0')"),
+            ("Enumap.replace_many (per record)",
+             "list(spec.replace_many(records, d=0))")):
+        run_time = timeit(
+            statement,
+            globals=dict(spec=spec, record=record, records=records),
+            number=N_RUNS if "many" not in statement else N_RUNS // 1000)
+        print(f"{label:<40} {run_time:.2f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
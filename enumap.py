@@ -1,11 +1,27 @@
+# Modules that only some methods need (asyncio, concurrent.futures, csv,
+# json, mmap, numpy, ...) are imported by those methods, so that
+# importing enumap stays cheap
+import array
 import enum
+import keyword
+import os
+import struct
+import sys
+import weakref
 
-from collections import namedtuple, OrderedDict
-from itertools import zip_longest
-
+from collections import Counter, deque, namedtuple, OrderedDict
+from collections.abc import Mapping
+from itertools import islice
+from functools import lru_cache, partial
+from operator import itemgetter
+from time import perf_counter
+from types import MappingProxyType
 
 __version__ = "1.5.0"
 
+# sentinel for a missing default value
+_NO_DEFAULT = object()
+
 
 class EnumapMeta(enum.EnumMeta):
     """An EnumMeta for friendlier, more informative REPL behavior"""
@@ -30,8 +46,9 @@ class EnumapMeta(enum.EnumMeta):
 
 class Enumap(enum.Enum, metaclass=EnumapMeta):
     """An Enum that maps data to its ordered, named members.
-    Produces OrderedDicts and namedtuples while ensuring that the
-    keys/fields match the names of the Enum members."""
+    Produces OrderedDicts (or other mappings, see `set_map_factory`)
+    and namedtuples while ensuring that the keys/fields match the names
+    of the Enum members."""
 
     @classmethod
     def names(cls):
@@ -41,17 +58,44 @@ class Enumap(enum.Enum, metaclass=EnumapMeta):
             names = cls.__names = tuple(cls.__members__)
         return names
 
+    @classmethod
+    def name_set(cls):
+        """frozenset of this Enum's member names"""
+        try:
+            name_set = cls.__name_set
+        except AttributeError:
+            name_set = cls.__name_set = frozenset(cls.names())
+        return name_set
+
+    @classmethod
+    def index_of(cls, name):
+        """Position of the member called `name` in `names()`
+
+        >>> Pie = Enumap("Pie", "rhubarb cherry mud")
+        >>> Pie.index_of("mud")
+        2
+        """
+        try:
+            return cls._indexes()[name]
+        except KeyError:
+            raise KeyError(f"{cls.__name__} requires keys {cls.names()}; "
+                           f"invalid key {name!r}") from None
+
     @classmethod
     def map(cls, *values, **named_values):
-        """Returns an OrderedDict from `values` & `named_values`, whose
-        keys match this Enum's members and their ordering
+        """Returns an OrderedDict (or another `map_factory()` mapping)
+        from `values` & `named_values`, whose keys match this Enum's
+        members and their ordering
 
         >>> Fruit = Enumap("Fruit", names="apple orange papaya")
         >>> Fruit.map("heart-shaped", "spherical", papaya="ellipsoid")
         OrderedDict([('apple', 'heart-shaped'), ('orange', ...), ...])
         """
-        mapping = cls._make_checked_mapping(*values, **named_values)
-        return OrderedDict(((k, mapping[k]) for k in cls.names()))
+        try:
+            make_map = cls.__map_maker
+        except AttributeError:
+            make_map = cls.__map_maker = _compile_maker(cls, "map")
+        return make_map(values, named_values)
 
     @classmethod
     def map_casted(cls, *values, **named_values):
@@ -66,8 +110,12 @@ class Enumap(enum.Enum, metaclass=EnumapMeta):
         >>> Order.map_casted("342 32342.23 2017-09-01".split())
         OrderedDict(('index', 342), ('cost', Decimal("3242.23")), ...)
         """
-        mapping = cls._make_casted_mapping(*values, **named_values)
-        return OrderedDict(((k, mapping[k]) for k in cls.names()))
+        try:
+            make_map = cls.__map_casted_maker
+        except AttributeError:
+            make_map = cls.__map_casted_maker = _compile_maker(
+                cls, "map_casted")
+        return make_map(values, named_values)
 
     @classmethod
     def tuple(cls, *values, **named_values):
@@ -78,19 +126,511 @@ class Enumap(enum.Enum, metaclass=EnumapMeta):
         >>> Tool.tuple("small", "heavy", forehead="unwieldy")
         Tool_tuple(hammer='small', mallet='heavy', forehead='unwieldy')
         """
-        tuple_class = cls.tuple_class()
         try:
-            return tuple_class(*values, **named_values)
-        except TypeError:
-            mapping = cls._make_checked_mapping(*values, **named_values)
-            return tuple_class(**mapping)
+            n_names, tuple_class, make_tuple = cls.__tuple_shortcut
+        except AttributeError:
+            n_names, tuple_class, make_tuple = cls.__tuple_shortcut = (
+                cls._tuple_shortcut())
+        if not named_values and len(values) == n_names:
+            return tuple.__new__(tuple_class, values)
+        return make_tuple(values, named_values)
 
     @classmethod
     def tuple_casted(cls, *values, **named_values):
         """Like `tuple`, but values are converted with the `types`
         mapping. Useful for deserializing ordered and named values."""
-        mapping = cls._make_casted_mapping(*values, **named_values)
-        return cls.tuple_class()(**mapping)
+        try:
+            make_tuple = cls.__tuple_casted_maker
+        except AttributeError:
+            make_tuple = cls.__tuple_casted_maker = _compile_maker(
+                cls, "tuple_casted")
+        return make_tuple(values, named_values)
+
+    @classmethod
+    def record(cls, *values, **named_values):
+        """Like `tuple`, but returns a mutable `record_class()` instance
+
+        >>> Tool = Enumap("Tool", names="hammer mallet forehead")
+        >>> tool = Tool.record("small", "heavy", forehead="unwieldy")
+        >>> tool.mallet = "light"
+        >>> tool
+        Tool_record(hammer='small', mallet='light', forehead='unwieldy')
+        """
+        try:
+            make_record = cls.__record_maker
+        except AttributeError:
+            make_record = cls.__record_maker = _compile_maker(cls, "record")
+        return make_record(values, named_values)
+
+    @classmethod
+    def record_casted(cls, *values, **named_values):
+        """Like `record`, but values are converted with the `types`
+        mapping. Useful for deserializing ordered and named values."""
+        try:
+            make_record = cls.__record_casted_maker
+        except AttributeError:
+            make_record = cls.__record_casted_maker = _compile_maker(
+                cls, "record_casted")
+        return make_record(values, named_values)
+
+    @classmethod
+    def maps(cls, rows, casted=False, lazy=True):
+        """Makes a `map` (or `map_casted`) for each of the `rows`, which
+        are positional or mappings keyed by member name. Names, types
+        and defaults are resolved once per batch. Returns a generator
+        unless `lazy` is False.
+
+        >>> Fruit = Enumap("Fruit", names="apple orange")
+        >>> Fruit.maps([("red", "orange"), ("green", "blood")], lazy=False)
+        [OrderedDict([('apple', 'red'), ...]), OrderedDict(...)]
+        """
+        records = _iter_records(cls._row_maker("map", casted), rows)
+        return records if lazy else list(records)
+
+    @classmethod
+    def tuples(cls, rows, casted=False, lazy=True):
+        """Makes a `tuple` (or `tuple_casted`) for each of the `rows`,
+        which are positional or mappings keyed by member name. Names,
+        types and defaults are resolved once per batch. Returns a
+        generator unless `lazy` is False.
+
+        >>> Point = Enumap("Point", names="x y")
+        >>> Point.set_types(int, int)
+        >>> Point.tuples([("1", "2"), ("3", "4")], casted=True, lazy=False)
+        [Point_tuple(x=1, y=2), Point_tuple(x=3, y=4)]
+        """
+        records = _iter_records(cls._row_maker("tuple", casted), rows)
+        return records if lazy else list(records)
+
+    @classmethod
+    def records(cls, rows, casted=False, lazy=True):
+        """Like `tuples`, but makes `record`s (or `record_casted`s)"""
+        records = _iter_records(cls._row_maker("record", casted), rows)
+        return records if lazy else list(records)
+
+    @classmethod
+    def replace(cls, _record, **changes):
+        """Returns a `tuple` with the values of `_record` (a `tuple`,
+        `record` or other sequence in member order) and `changes`
+
+        >>> Point = Enumap("Point", names="x y")
+        >>> Point.replace(Point.tuple(1, 2), y=5)
+        Point_tuple(x=1, y=5)
+        """
+        try:
+            replace_row = cls.__replacers[0]
+        except AttributeError:
+            cls.__replacers = (_make_replacer(cls, False),
+                               _make_replacer(cls, True))
+            replace_row = cls.__replacers[0]
+        return replace_row(_record, changes)
+
+    @classmethod
+    def replace_casted(cls, _record, **changes):
+        """Like `replace`, but `changes` are converted with `types()`"""
+        try:
+            replace_row = cls.__replacers[1]
+        except AttributeError:
+            cls.__replacers = (_make_replacer(cls, False),
+                               _make_replacer(cls, True))
+            replace_row = cls.__replacers[1]
+        return replace_row(_record, changes)
+
+    @classmethod
+    def replace_many(cls, _records, casted=False, **changes):
+        """Generates a `replace`d `tuple` for each of `_records`. A change
+        that's callable is called with a record's current value to get
+        its new value. With `casted`, new values are converted with
+        `types()`. Change keys are validated (and constant values
+        casted) once for the whole batch. A member named "casted" can
+        only be changed with `replace` or `replace_casted`.
+
+        Invalid keys and constants that can't be casted raise right
+        away rather than when the records are consumed. A `TypeCastError`
+        raised for a record carries its index as its `row` attribute.
+
+        >>> Order = Enumap("Order", names="index cost currency")
+        >>> list(Order.replace_many(orders, cost=round, currency="EUR"))
+        [Order_tuple(index=1, cost=10, currency='EUR'), ...]
+        """
+        constants, calls = cls._indexed_changes(changes, casted,
+                                                callables=True)
+        make_tuple = partial(tuple.__new__, cls.tuple_class())
+        return _iter_replaced(make_tuple, cls.names(), _records,
+                              constants, calls)
+
+    @classmethod
+    def _indexed_changes(cls, changes, casted, callables=False):
+        """Validates the keys of `changes` and returns `(constants,
+        calls)`: `(index, value)` pairs of constant (and casted) values
+        and `(index, key, callable, cast)` tuples of callable ones"""
+        invalid = (set(changes) - cls.name_set()) or {}
+        if invalid:
+            raise KeyError(f"{cls.__name__} requires keys {cls.names()}; "
+                           f"invalid keys {invalid}")
+        index_of = cls._indexes()
+        type_row = cls._type_row() if casted else None
+        constants = []
+        calls = []
+        for key, value in changes.items():
+            i = index_of[key]
+            cast = type_row[i] if casted else None
+            if callables and callable(value):
+                calls.append((i, key, value, cast))
+            elif cast is not None:
+                try:
+                    constants.append((i, cast(value)))
+                except Exception as e:
+                    raise _cast_error(key, value, e)
+            else:
+                constants.append((i, value))
+        return constants, calls
+
+    @classmethod
+    def tuples_parallel(cls, rows, chunk_size=10_000, ordered=True,
+                        max_workers=None):
+        """Like `tuples(rows, casted=True)`, but rows are casted in chunks
+        of `chunk_size` by a pool of `max_workers` processes. Records are
+        generated in the order of `rows` unless `ordered` is False.
+        Only a few chunks per process are in flight at any time.
+
+        Workers rebuild this Enumap from its names, types and defaults,
+        so Enumaps made with the functional API work too, but the
+        `types()` callables must be picklable.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        make_tuple = partial(tuple.__new__, cls.tuple_class())
+        interned = [i for i, name in enumerate(cls.names())
+                    if name in cls.interned()]
+        if interned:
+            # casted values are unpickled as fresh objects, so they're
+            # interned here rather than in the workers
+            make_tuple = partial(_intern_positions, make_tuple,
+                                 cls._interner(), interned)
+        blueprint = cls._blueprint()
+        chunks = _iter_chunks(rows, chunk_size)
+        max_workers = max_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers) as executor:
+            for casted_rows in _iter_parallel(executor, blueprint, chunks,
+                                              2 * max_workers, ordered):
+                yield from map(make_tuple, casted_rows)
+
+    @classmethod
+    async def aiter_records(cls, reader, sep=None, casted=True,
+                            encoding="utf-8", chunk_size=1 << 16,
+                            executor_threshold=1000, executor=None):
+        """Asynchronously generates a `tuple_casted` (or `tuple`) for each
+        line read from an asyncio `StreamReader`, split on `sep`
+        (whitespace by default).
+
+        The reader is read `chunk_size` bytes at a time and the next chunk
+        is only read once the records of the last one have been consumed.
+        Chunks with at least `executor_threshold` lines are casted in
+        `executor` (the event loop's default executor if None) so that
+        the event loop isn't blocked.
+
+        >>> async for order in Order.aiter_records(reader, sep=","):
+        ...     await process(order)
+        """
+        import asyncio
+
+        make = cls._row_maker("tuple", casted)
+        # the running loop (get_running_loop needs Python 3.7)
+        loop = asyncio.get_event_loop()
+        start = 0
+        tail = b""
+        while tail is not None:
+            chunk = await reader.read(chunk_size)
+            if chunk:
+                lines = (tail + chunk).split(b"\n")
+                tail = lines.pop()
+            else:
+                lines, tail = [tail], None
+            lines = (line.rstrip(b"\r") for line in lines)
+            rows = [line.decode(encoding).split(sep)
+                    for line in lines if line and not line.isspace()]
+            if len(rows) >= executor_threshold:
+                records = await loop.run_in_executor(
+                    executor, _make_records, make, rows, start)
+            else:
+                records = _make_records(make, rows, start)
+            start += len(rows)
+            for record in records:
+                yield record
+
+    @classmethod
+    def _blueprint(cls):
+        """What it takes to rebuild this Enumap in another process"""
+        return (cls.__name__, cls.names(), dict(cls.types()),
+                cls._default_row())
+
+    @classmethod
+    def columns(cls, rows, casted=False):
+        """Returns an OrderedDict of columns keyed by member name for
+        `rows`, which are validated and filled like in `tuples`.
+        Columns of members typed `int` or `float` are compact
+        `array.array`s as long as their values are all of that exact
+        type and fit; others are lists.
+
+        >>> Point = Enumap("Point", names="x y label")
+        >>> Point.set_types(int, float)
+        >>> Point.columns([("1", "2", "a"), ("3", "4", "b")], casted=True)
+        OrderedDict([('x', array('q', [1, 3])), ('y', ...), ('label', ...)])
+        """
+        records = _iter_records(cls._row_maker("tuple", casted), rows)
+        return cls._gather_columns(records)
+
+    @classmethod
+    def _gather_columns(cls, records):
+        """Returns an OrderedDict of the columns of `records`, see
+        `columns`. Records are gathered a chunk at a time."""
+        names = cls.names()
+        type_row = cls._type_row()
+        columns = OrderedDict()
+        for name, type_ in zip(names, type_row):
+            typecode = _ARRAY_TYPECODES.get(type_)
+            columns[name] = array.array(typecode) if typecode else []
+        while True:
+            chunk = list(islice(records, _COLUMNS_CHUNK_SIZE))
+            if not chunk:
+                return columns
+            for name, type_, values in zip(names, type_row, zip(*chunk)):
+                _extend_column(columns, name, type_, values)
+
+    @classmethod
+    def cast_columns(cls, columns):
+        """Returns an OrderedDict of columns keyed by member name, with
+        every value of `columns` (a mapping of member names to equally
+        long sequences) cast with its `types()` callable. Columns of
+        members typed `int` or `float` become `array.array`s (or stay
+        numpy arrays) as long as their values fit; others are lists.
+
+        >>> Point = Enumap("Point", names="x y label")
+        >>> Point.set_types(int, float)
+        >>> Point.cast_columns(dict(x=["1", "3"], y=["2", "4"],
+        ...                         label=["a", "b"]))
+        OrderedDict([('x', array('q', [1, 3])), ('y', ...), ('label', ...)])
+        """
+        names = cls.names()
+        defaults = cls._default_row()
+        if (not cls.name_set().issuperset(columns)
+                or (defaults is None and len(columns) != len(names))):
+            cls._raise_invalid_args((), columns, names)
+        lengths = {len(column) for column in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"{cls.__name__} columns must have the same "
+                             f"length; got lengths {lengths}")
+        n_rows = lengths.pop() if lengths else 0
+        types = cls.types()
+        interned = cls.interned()
+        casted_columns = OrderedDict()
+        for index, name in enumerate(names):
+            type_ = types.get(name)
+            if name not in columns:
+                casted_columns[name] = _repeat_column(
+                    type_, defaults[index], n_rows)
+            elif type_ is None:
+                casted_columns[name] = list(columns[name])
+            else:
+                casted_columns[name] = _cast_column(
+                    name, type_, columns[name])
+            column = casted_columns[name]
+            if name in interned and name in columns and type(column) is list:
+                casted_columns[name] = list(map(cls._interner(), column))
+        return casted_columns
+
+    @classmethod
+    def dumps_jsonl(cls, records, positional=False):
+        """Returns JSON lines, one object keyed by member name per record,
+        or one array of values in member order if `positional` is True.
+        `records` are validated and filled like the rows of `tuples`.
+
+        >>> Point = Enumap("Point", names="x y")
+        >>> Point.dumps_jsonl([(1, 2), dict(y=4, x=3)])
+        '{"x": 1, "y": 2}\n{"x": 3, "y": 4}\n'
+        """
+        encode_array, encode_split = _json_encoders()
+        rows = _iter_records(cls._row_maker("row"), records)
+        if positional:
+            return "".join(f"{encode_array(row)}\n" for row in rows)
+        try:
+            template = cls.__jsonl_template
+        except AttributeError:
+            keys = (encode_array(name).replace("%", "%%")
+                    for name in cls.names())
+            template = cls.__jsonl_template = (
+                "{" + ", ".join(f"{key}: %s" for key in keys) + "}\n")
+        return "".join(map(partial(_fill_object_template, encode_array,
+                                   encode_split, template, cls.names()),
+                           rows))
+
+    @classmethod
+    def loads_jsonl(cls, lines, casted=False):
+        """Generates a `tuple` (or `tuple_casted`) for each of the JSON
+        `lines` (str or bytes), which are objects keyed by member name or
+        arrays of values in member order. Blank lines are skipped.
+
+        >>> with open("points.jsonl") as points_jsonl:
+        ...     points = list(Point.loads_jsonl(points_jsonl))
+        """
+        rows = _iter_json_rows(cls, lines)
+        return _iter_records(cls._row_maker("tuple", casted), rows)
+
+    @classmethod
+    def read_csv(cls, fileobj, header=True, casted=True, **fmtparams):
+        """Generates a `tuple_casted` (or `tuple`) for each row of a CSV
+        file. The header row, if there is one, is validated against this
+        Enum's members once and may list them in any order. Extra
+        keyword arguments are passed on to `csv.reader`.
+
+        >>> with open("orders.csv", newline="") as orders_csv:
+        ...     orders = list(Order.read_csv(orders_csv))
+        """
+        import csv
+
+        rows = csv.reader(fileobj, **fmtparams)
+        return cls._iter_table(rows, header, casted)
+
+    @classmethod
+    def iter_delimited(cls, fileobj, sep=None, header=True, casted=True,
+                       chunk_size=1 << 20):
+        """Like `read_csv`, but for simple delimited text without
+        quoting. Lines are split on `sep` (whitespace by default) and
+        `fileobj` is read in chunks of `chunk_size` characters, so memory
+        use is bounded no matter how large the file is.
+
+        >>> with open("orders.tsv") as orders_tsv:
+        ...     orders = list(Order.iter_delimited(orders_tsv, "\\t"))
+        """
+        lines = _iter_lines(fileobj, chunk_size)
+        rows = (line.split(sep) for line in lines if not line.isspace())
+        return cls._iter_table(rows, header, casted)
+
+    @classmethod
+    def _iter_table(cls, rows, header, casted):
+        make = cls._row_maker("tuple", casted)
+        rows = filter(None, rows)  # blank lines
+        if header:
+            columns = next(rows, None)
+            if columns is None:
+                return
+            rows = cls._align_to_header(columns, rows)
+        yield from _iter_records(make, rows)
+
+    @classmethod
+    def _align_to_header(cls, header, rows):
+        """Validates `header` against this Enum's members once and
+        returns `rows` rearranged into member order"""
+        header = tuple(header)
+        if len(set(header)) != len(header):
+            raise KeyError(f"{cls.__name__} got duplicate columns in "
+                           f"header {header}")
+        names = cls.names()
+        columns = set(header)
+        # only a SparseEnumap, which has a default row, can miss members
+        if (not columns <= cls.name_set()
+                or (cls._default_row() is None and len(columns) < len(names))):
+            # raises KeyError just like it would for rows with these keys
+            cls._raise_invalid_args((), columns, names)
+        if header == names:
+            align = None
+        elif len(header) == len(names):
+            align = itemgetter(*map(header.index, names))
+        else:
+            def align(row):
+                return dict(zip(header, row))
+        return _iter_aligned(cls, header, align, rows)
+
+    @classmethod
+    def structured_dtype(cls):
+        """NumPy structured `dtype` with a field for each member, in
+        order. Field types are derived from `types()`; members without
+        a numeric type are stored as Python objects. So are `int` and
+        `bool` members of a SparseEnumap whose default is None, while
+        None defaults of `float` members become NaN.
+
+        >>> Point = Enumap("Point", names="x y label")
+        >>> Point.set_types(int, float)
+        >>> Point.structured_dtype()
+        dtype([('x', '<i8'), ('y', '<f8'), ('label', 'O')])
+        """
+        numpy = _require_numpy("structured_dtype")
+        default_row = cls._default_row() or (_NO_DEFAULT,) * len(cls.names())
+        fields = []
+        for name, type_, default_value in zip(cls.names(), cls._type_row(),
+                                              default_row):
+            field_type = _numpy_field_type(type_)
+            if default_value is None and field_type in ("i8", "?"):
+                field_type = object
+            fields.append((name, field_type))
+        return numpy.dtype(fields)
+
+    @classmethod
+    def to_structured(cls, rows):
+        """Returns a NumPy structured array of `rows`, which are
+        validated and filled like in `tuples`. Each numeric column is
+        converted to its field type in one go. Values of object fields
+        with a `types()` callable are casted one by one, like in
+        `tuples(casted=True)`: only the values that are given are casted,
+        the default values of a `SparseEnumap` are left as they are.
+        """
+        numpy = _require_numpy("to_structured")
+        dtype = cls.structured_dtype()
+        records = _iter_records(cls._structured_maker(dtype), rows)
+        columns = cls._gather_columns(records)
+        n_rows = len(next(iter(columns.values()), ()))
+        structured = numpy.empty(n_rows, dtype=dtype)
+        for name, column in columns.items():
+            field_type = dtype.fields[name][0]
+            try:
+                if field_type.hasobject:
+                    structured[name] = column
+                else:
+                    structured[name] = numpy.asarray(column).astype(
+                        field_type)
+            except Exception as e:
+                for index, value in enumerate(column):
+                    try:
+                        numpy.asarray([value]).astype(field_type)
+                    except Exception as value_error:
+                        error = _cast_error(name, value, value_error)
+                        raise TypeCastError(f"Row {index}: {error}",
+                                            name, index) from value_error
+                raise TypeCastError(
+                    f"Key '{name}' got invalid values for field type "
+                    f"{field_type} (error: '{e}')", name) from e
+        return structured
+
+    @classmethod
+    def _structured_maker(cls, dtype):
+        """`row` constructor for `to_structured` that casts only the
+        members stored in the object fields of `dtype`, leaving numeric
+        fields to NumPy"""
+        try:
+            return cls.__structured_maker
+        except AttributeError:
+            type_row = tuple(
+                type_ if dtype.fields[name][0].hasobject else None
+                for name, type_ in zip(cls.names(), cls._type_row()))
+            make = _compile_maker(cls, "row_casted", type_row)
+            cls.__structured_maker = make
+            return make
+
+    @classmethod
+    def from_structured(cls, structured):
+        """Returns a list of `tuple`s from the rows of a NumPy
+        structured array whose fields are named after this Enum's
+        members, like the ones made by `to_structured`"""
+        _require_numpy("from_structured")
+        names = cls.names()
+        rows = structured.tolist()
+        if structured.dtype.names == names:
+            tuple_class = cls.tuple_class()
+            return [tuple.__new__(tuple_class, row) for row in rows]
+        fields = structured.dtype.names
+        return cls.tuples((dict(zip(fields, row)) for row in rows),
+                          lazy=False)
 
     @classmethod
     def tuple_class(cls):
@@ -103,6 +643,99 @@ class Enumap(enum.Enum, metaclass=EnumapMeta):
             cls.__tuple_class = tuple_class
         return tuple_class
 
+    @classmethod
+    def map_factory(cls):
+        """The mapping type made by `map`, `map_casted` and `maps`.
+        `OrderedDict` unless it's been changed with `set_map_factory`."""
+        return getattr(cls, "_Enumap__map_factory", OrderedDict)
+
+    @classmethod
+    def set_map_factory(cls, factory):
+        """Set the mapping type made by `map`, `map_casted` and `maps`.
+        `factory` is called with key/value pairs in member order, like
+        `dict`. `types.MappingProxyType` makes read-only dicts.
+
+        >>> Fruit = Enumap("Fruit", names="apple orange")
+        >>> Fruit.set_map_factory(dict)
+        >>> Fruit.map("red", "orange")
+        {'apple': 'red', 'orange': 'orange'}
+        """
+        cls.__map_factory = factory
+        cls._reset_makers()
+
+    @classmethod
+    def record_class(cls):
+        """Mutable class with `__slots__` that match this Enum's
+        members and their ordering. Its instances compare equal when
+        their values do and iterate over their values in order."""
+        try:
+            record_class = cls.__record_class
+        except AttributeError:
+            record_class = _make_record_class(cls.__name__ + "_record",
+                                              cls.names(),
+                                              cls._default_row())
+            cls.__record_class = record_class
+        return record_class
+
+    @classmethod
+    def converter(cls, source, rename=None, fill=_NO_DEFAULT):
+        """Returns a `Converter` from records of the `source` Enumap
+        (its `tuple`s or other sequences in its member order) to this
+        Enumap's `tuple`s. Members are matched by name, or with `rename`,
+        a mapping of source names to names of this Enumap. Unmatched
+        members get `fill` or, if this is a SparseEnumap, their default.
+        Defaults are read when the converter is made, so make a new one
+        after calling `set_defaults`.
+
+        >>> OrderV1 = Enumap("OrderV1", "index cost due")
+        >>> OrderV2 = SparseEnumap("OrderV2", "due_on index currency")
+        >>> upgrade = OrderV2.converter(OrderV1, rename={"due": "due_on"})
+        >>> upgrade(OrderV1.tuple(1, 9.99, "2017-09-01"))
+        OrderV2_tuple(due_on='2017-09-01', index=1, currency=None)
+        >>> upgraded = list(upgrade.many(v1_orders))
+        """
+        names = cls.names()
+        source_names = source.names()
+        rename = dict(rename or {})
+        invalid = (set(rename) - set(source_names)) or {}
+        invalid_targets = (set(rename.values()) - set(names)) or {}
+        if invalid or invalid_targets:
+            raise KeyError(
+                f"{cls.__name__} can't rename {source.__name__} keys; "
+                f"invalid keys {invalid}; invalid new keys {invalid_targets}")
+        targets = [rename.get(name, name) for name in source_names]
+        duplicates = {target for target, count in Counter(targets).items()
+                      if count > 1 and target in cls.name_set()}
+        if duplicates:
+            raise KeyError(f"{cls.__name__} got more than one "
+                           f"{source.__name__} key for keys {duplicates}")
+        source_indexes = {target: i for i, target in enumerate(targets)}
+        if fill is not _NO_DEFAULT:
+            fills = (fill,) * len(names)
+        else:
+            fills = cls._default_row()
+        missing = set(names) - set(source_indexes)
+        if missing and fills is None:
+            raise KeyError(f"{cls.__name__} requires keys {names}; "
+                           f"missing keys {missing} in {source.__name__}")
+        items = "".join(f"record[{source_indexes[name]}], "
+                        if name in source_indexes else f"_fills[{i}], "
+                        for i, name in enumerate(names))
+        source_code = (
+            f"def convert(record):\n"
+            f"    if len(record) != {len(source_names)}:\n"
+            f"        raise KeyError(f\"Record {{record!r}} doesn't match \"\n"
+            f"                       f\"keys {{_source_names}}\")\n"
+            f"    return _tuple_new(_tuple_class, ({items}))\n")
+        namespace = dict(_tuple_new=tuple.__new__,
+                         _tuple_class=cls.tuple_class(), _fills=fills,
+                         _source_names=source_names)
+        code = compile(source_code,
+                       f"<enumap {source.__name__} to {cls.__name__}>",
+                       "exec")
+        exec(code, namespace)
+        return Converter(namespace["convert"])
+
     @classmethod
     def set_types(cls, *types, **named_types):
         """Set `types` mapping for `map/tuple_casted` methods.
@@ -114,13 +747,10 @@ class Enumap(enum.Enum, metaclass=EnumapMeta):
         """
         # type mappings are allowed to be a subset of the member keys
         # in other words, not all members have to have a type
-        sparse_types = SparseEnumap("temporary_types", cls.names())
-        sparse_type_map = sparse_types.map(*types, **named_types)
-        non_null_types = {k: v for k, v in sparse_type_map.items()
-                          if v is not None}
-        type_subset = Enumap(f"{cls.__name__}_types",
-                             tuple(non_null_types.keys()))
-        cls.__member_types = type_subset.map(*types, **named_types)
+        member_types = cls._sparse_map(types, named_types)
+        cls.__member_types = {k: v for k, v in member_types.items()
+                              if v is not None}
+        cls._reset_makers()
 
     @classmethod
     def types(cls):
@@ -134,24 +764,369 @@ class Enumap(enum.Enum, metaclass=EnumapMeta):
             return cls.__member_types
 
     @classmethod
-    def _make_checked_mapping(cls, *values, **named_values):
-        """Generate key-value pairs where keys are strictly the names
-        of the members of this Enum. Raises `KeyError` for both
-        missing and invalid keys."""
+    def set_interned(cls, *names, maxsize=1 << 16):
+        """Share one object between equal values of the members `names`
+        in casted constructors and bulk methods (`tuple_casted`,
+        `tuples(rows, casted=True)`, `read_csv`, `cast_columns`, ...).
+        This saves memory when a feed repeats a few distinct values,
+        like hostnames or statuses, millions of times. Values are
+        interned after casting; only str, bytes and int values are
+        shared, values of other types are kept as they are. Up to
+        `maxsize` distinct values are kept (None for no limit); a full
+        table is emptied and refilled.
+
+        >>> Hit = Enumap("Hit", names="host status bytes")
+        >>> Hit.set_interned("host", "status")
+        """
+        invalid = (set(names) - cls.name_set()) or {}
+        if invalid:
+            raise KeyError(f"{cls.__name__} requires keys {cls.names()}; "
+                           f"invalid keys {invalid}")
+        cls.__interned = frozenset(names)
+        cls.__interner = _make_interner(maxsize)
+        cls._reset_makers()
+
+    @classmethod
+    def interned(cls):
+        """frozenset of the member names whose values are interned"""
+        return cls.__dict__.get("_Enumap__interned", frozenset())
+
+    @classmethod
+    def _interner(cls):
+        """Function that returns the shared object equal to its argument"""
+        return cls.__dict__.get("_Enumap__interner")
+
+    @classmethod
+    def cast_cache_info(cls):
+        """Mapping like `{member_name: CacheInfo}` of the hits, misses
+        and sizes of the member types wrapped with `cached`"""
+        return {name: type_.cache_info()
+                for name, type_ in cls.types().items()
+                if hasattr(type_, "cache_info")}
+
+    @classmethod
+    def set_formats(cls, *formats, byte_order="<", **named_formats):
+        """Set the `struct` format of every member for binary codec
+        methods like `unpack` and `pack`. Each format must describe
+        exactly one value. `byte_order` is a `struct` byte order prefix.
+
+        >>> Reading = Enumap("Reading", names="sensor value flags")
+        >>> Reading.set_formats("H", "d", flags="B")
+        >>> Reading.record_format()
+        '<HdB'
+        """
         names = cls.names()
-        mapping = dict(zip(names, values), **named_values)
-        if set(mapping) == set(names) and len(values) <= len(names):
-            return mapping
-        else:
-            cls._raise_invalid_args(values, mapping, names)
+        member_formats = dict(zip(names, formats), **named_formats)
+        missing = (set(names) - set(member_formats)) or {}
+        invalid = (set(member_formats) - set(names)) or {}
+        if len(formats) > len(names):
+            raise KeyError(
+                f"{cls.__name__} requires formats for keys {names}; "
+                f"expected {len(names)} formats, got {len(formats)}")
+        elif missing or invalid:
+            raise KeyError(
+                f"{cls.__name__} requires formats for keys {names}; "
+                f"missing keys {missing}; invalid keys {invalid}")
+        for name, fmt in member_formats.items():
+            fmt_struct = struct.Struct(byte_order + fmt)
+            if len(fmt_struct.unpack(bytes(fmt_struct.size))) != 1:
+                raise ValueError(f"Format {fmt!r} of key '{name}' must "
+                                 f"describe exactly one value")
+        cls.__member_formats = {name: member_formats[name] for name in names}
+        cls.__byte_order = byte_order
+        cls._reset_makers()
 
     @classmethod
-    def _make_casted_mapping(cls, *values, **named_values):
-        """Like `_make_checked_mapping`, but values are casted based
-        on the `types()` mapping"""
-        mapping = cls._make_checked_mapping(*values, **named_values)
-        mapping.update(_type_cast_items(mapping, cls.types()))
-        return mapping
+    def formats(cls):
+        """Mapping like `{member_name: struct_format}` for binary codec
+        methods. This either comes from `set_formats` or, for members
+        typed `int`, `float` or `bool`, from `types()`."""
+        try:
+            return cls.__member_formats
+        except AttributeError:
+            types = cls.types()
+            return {name: _STRUCT_FORMATS[types[name]]
+                    for name in cls.names()
+                    if types.get(name) in _STRUCT_FORMATS}
+
+    @classmethod
+    def record_format(cls):
+        """`struct` format string of binary records whose fields match
+        this Enum's members, their ordering and their `formats()`.
+        Unlike `record_struct().format`, it's a str on every Python."""
+        try:
+            return cls.__record_format
+        except AttributeError:
+            names = cls.names()
+            formats = cls.formats()
+            missing = set(names) - set(formats)
+            if missing:
+                raise KeyError(f"{cls.__name__} requires formats for keys "
+                               f"{names}; missing keys {missing}")
+            byte_order = getattr(cls, "_Enumap__byte_order", "<")
+            fmt = byte_order + "".join(formats[name] for name in names)
+            cls.__record_format = fmt
+            return fmt
+
+    @classmethod
+    def record_struct(cls):
+        """`struct.Struct` of `record_format()`"""
+        try:
+            return cls.__record_struct
+        except AttributeError:
+            record_struct = struct.Struct(cls.record_format())
+            cls.__record_struct = record_struct
+            return record_struct
+
+    @classmethod
+    def unpack(cls, buffer, offset=0):
+        """Returns a `tuple` unpacked from the binary record at
+        `offset` in `buffer`
+
+        >>> Reading.unpack(b"\\x01\\x00" + bytes(8) + b"\\x02")
+        Reading_tuple(sensor=1, value=0.0, flags=2)
+        """
+        values = cls.record_struct().unpack_from(buffer, offset)
+        return tuple.__new__(cls.tuple_class(), values)
+
+    @classmethod
+    def iter_unpack(cls, buffer):
+        """Generates a `tuple` for each of the consecutive binary
+        records in `buffer`. Records aren't copied out of the buffer
+        before they're unpacked."""
+        values = cls.record_struct().iter_unpack(memoryview(buffer))
+        return map(partial(tuple.__new__, cls.tuple_class()), values)
+
+    @classmethod
+    def pack(cls, record):
+        """Returns the bytes of a binary record for `record`, which is
+        a `tuple` or another sequence of values in member order"""
+        return cls.record_struct().pack(*record)
+
+    @classmethod
+    def pack_into(cls, buffer, offset, record):
+        """Like `pack`, but writes the record into `buffer` at `offset`"""
+        cls.record_struct().pack_into(buffer, offset, *record)
+
+    @classmethod
+    def write_records(cls, fileobj, records):
+        """Writes a record file to the binary `fileobj`: a header with
+        this Enum's name, members and `record_struct()` format followed
+        by a packed binary record for each of `records`. Returns the
+        number of records written. See `open_records`."""
+        import json
+
+        record_struct = cls.record_struct()
+        header = json.dumps(dict(name=cls.__name__, names=cls.names(),
+                                 format=cls.record_format())).encode()
+        fileobj.write(_RECORD_FILE_MAGIC)
+        fileobj.write(len(header).to_bytes(4, "little"))
+        fileobj.write(header)
+        pack = record_struct.pack
+        records = iter(records)
+        n_records = 0
+        while True:
+            chunk = [pack(*record)
+                     for record in islice(records, _RECORDS_CHUNK_SIZE)]
+            if not chunk:
+                return n_records
+            fileobj.write(b"".join(chunk))
+            n_records += len(chunk)
+
+    @classmethod
+    def open_records(cls, path):
+        """Opens a file written by `write_records` as a `RecordFile`.
+        The records are memory-mapped rather than read into memory.
+        Raises `KeyError` if the file's members differ from this Enum's.
+
+        >>> with Reading.open_records("readings.bin") as readings:
+        ...     first, last = readings[0], readings[-1]
+        """
+        return RecordFile(cls, path)
+
+    @classmethod
+    def enable_stats(cls):
+        """Start recording, for this Enumap, the number of calls to its
+        constructors (`map`, `tuple_casted`, etc.), how many successful
+        calls took the positional fast path (every value given
+        positionally) rather than binding keywords or filling defaults,
+        the time spent casting each member and `TypeCastError`s per key.
+
+        Constructors are recompiled with instrumentation, so Enumaps
+        without stats enabled pay nothing for it. See `stats`.
+        """
+        cls.__stats = _Stats()
+        _instrumented.add(cls)
+        cls._reset_makers()
+
+    @classmethod
+    def disable_stats(cls):
+        """Stop recording stats and drop the ones recorded so far"""
+        if "_Enumap__stats" in cls.__dict__:
+            del cls.__stats
+        _instrumented.discard(cls)
+        cls._reset_makers()
+
+    @classmethod
+    def stats(cls):
+        """Dict of the stats recorded since `enable_stats` was called,
+        or None if stats aren't enabled
+
+        >>> Point.enable_stats()
+        >>> Point.tuple_casted("1", "2")
+        >>> Point.stats()
+        {'calls': {'tuple_casted': 1}, 'fast_path': 1, 'fallback': 0,
+         'cast_seconds': {'x': 1.1e-06, 'y': 4.2e-07}, 'cast_errors': {}}
+        """
+        stats = cls.__dict__.get("_Enumap__stats")
+        return stats.as_dict() if stats is not None else None
+
+    @classmethod
+    def _row_maker(cls, kind, casted=False):
+        """Constructor like `map` or `tuple` (or their casted variants)
+        that takes a tuple of `values` and a dict of `named_values`"""
+        if casted:
+            kind = f"{kind}_casted"
+        attr = f"_Enumap__{kind}_maker"
+        try:
+            return getattr(cls, attr)
+        except AttributeError:
+            make = _compile_maker(cls, kind)
+            setattr(cls, attr, make)
+            return make
+
+    @classmethod
+    def _tuple_shortcut(cls):
+        """The number of members, `tuple_class()` and the `tuple` maker,
+        so `tuple` can skip calling the maker when every value is given
+        positionally. Instrumented Enumaps always call their maker."""
+        make_tuple = cls._row_maker("tuple")
+        if "_Enumap__stats" in cls.__dict__:
+            return -1, None, make_tuple
+        return len(cls.names()), cls.tuple_class(), make_tuple
+
+    @classmethod
+    def _reset_makers(cls):
+        """Drop the compiled constructors and codecs so that they're
+        rebuilt with fresh types, defaults and formats on their next use"""
+        for kind in _MAKER_WRAPPERS:
+            for attr in (f"_Enumap__{kind}_maker",
+                         f"_Enumap__{kind}_casted_maker"):
+                if attr in cls.__dict__:
+                    delattr(cls, attr)
+        if "_Enumap__tuple_shortcut" in cls.__dict__:
+            del cls.__tuple_shortcut
+        if "_Enumap__replacers" in cls.__dict__:
+            del cls.__replacers
+        if "_Enumap__structured_maker" in cls.__dict__:
+            del cls.__structured_maker
+        if "_Enumap__record_format" in cls.__dict__:
+            del cls.__record_format
+        if "_Enumap__record_struct" in cls.__dict__:
+            del cls.__record_struct
+        if "_Enumap__type_row" in cls.__dict__:
+            del cls.__type_row
+        if "_Enumap__record_class" in cls.__dict__:
+            init = cls.__record_class.__init__
+            init.__defaults__ = cls._default_row()
+
+    @classmethod
+    def _indexes(cls):
+        """Dict of member names to their positions"""
+        try:
+            indexes = cls.__indexes
+        except AttributeError:
+            indexes = cls.__indexes = {
+                name: i for i, name in enumerate(cls.names())}
+        return indexes
+
+    @classmethod
+    def _type_row(cls):
+        """`types()` callables in member order, None for untyped members"""
+        try:
+            type_row = cls.__type_row
+        except AttributeError:
+            types = cls.types()
+            type_row = cls.__type_row = tuple(
+                types.get(name) for name in cls.names())
+        return type_row
+
+    @classmethod
+    def _default_row(cls):
+        """Values of missing members in member order, if there are any"""
+        return None
+
+    @classmethod
+    def _maker_source(cls, finish):
+        """Source of a function that binds positional and keyword
+        values to a row ordered like this Enum's members. Raises
+        `KeyError` for both missing and invalid keys.
+
+        Keyword values that override or complete positional values are
+        put in place by their member's index, without a dict."""
+        names = cls.names()
+        n_names = len(names)
+        return f"""\
+def make(values, named_values):
+    n_values = len(values)
+    if not named_values:
+        if n_values == {n_names}:
+{finish("values", 12)}
+        mapping = dict(_zip(_names, values))
+    elif not values:
+        mapping = named_values
+        if len(mapping) == {n_names}:
+            try:
+                row = _row_of(mapping)
+            except KeyError:
+                pass
+            else:
+{finish("row", 16)}
+    else:
+        if n_values <= {n_names}:
+            row = [*values, *_blank_tails[n_values]]
+            n_missing = {n_names} - n_values
+            try:
+                for key, value in named_values.items():
+                    i = _index_of[key]
+                    if i >= n_values:
+                        n_missing -= 1
+                    row[i] = value
+            except KeyError:
+                pass
+            else:
+                if not n_missing:
+{finish("row", 20)}
+        mapping = dict(_zip(_names, values), **named_values)
+    _raise_invalid_args(values, mapping, _names)
+"""
+
+    @classmethod
+    def _maker_namespace(cls):
+        names = cls.names()
+        blank_tails = _Tails((None,) * len(names))
+        return dict(_zip=zip, _names=names,
+                    _row_of=_row_getter(names),
+                    _index_of=cls._indexes(),
+                    _blank_tails=blank_tails,
+                    _raise_invalid_args=cls._raise_invalid_args)
+
+    @classmethod
+    def _sparse_map(cls, values, named_values):
+        """Validates `values` and `named_values` like `SparseEnumap.map`
+        would and returns a dict of the given values in member order;
+        no constructor is compiled for it"""
+        names = cls.names()
+        invalid = (set(named_values) - cls.name_set()) or {}
+        if len(values) > len(names):
+            raise KeyError(
+                f"{cls.__name__} requires keys {names}; "
+                f"expected {len(names)} arguments, got {len(values)}")
+        elif invalid:
+            raise KeyError(f"{cls.__name__} requires keys {names}; "
+                           f"invalid keys {invalid}")
+        mapping = dict(zip(names, values), **named_values)
+        return {name: mapping[name] for name in names if name in mapping}
 
     @classmethod
     def _raise_invalid_args(cls, values, mapping, names):
@@ -169,19 +1144,797 @@ class Enumap(enum.Enum, metaclass=EnumapMeta):
                 f"missing keys {missing}; invalid keys {invalid}")
 
 
-def _type_cast_items(mapping, types):
-    """Generates key/value pairs for which each
-    value is casted with the callable in the `types` mapping.
+_MAKER_WRAPPERS = {
+    "map": "_map_factory(_zip(_names, {}))".format,
+    "tuple": "_tuple_new(_tuple_class, {})".format,
+    "record": "_record_class(*{})".format,
+    "row": "tuple({})".format,
+}
+
+
+def _compile_maker(enumap, kind, type_row=None):
+    """Generates a `map`, `tuple` or `record` constructor (or a casted
+    variant, or one for plain tuples called "row") specialized for the
+    members of `enumap`, much like `namedtuple` generates `__new__`.
+    Casted variants cast with `type_row` if it's given rather than with
+    `enumap._type_row()`.
+    If `enumap` has stats enabled, the constructor is instrumented."""
+    record_kind, _, casted = kind.partition("_")
+    names = enumap.names()
+    stats = vars(enumap).get("_Enumap__stats")
+    namespace = enumap._maker_namespace()
+    if record_kind == "tuple":
+        namespace.update(_tuple_new=tuple.__new__,
+                         _tuple_class=enumap.tuple_class())
+    elif record_kind == "record":
+        namespace.update(_record_class=enumap.record_class())
+    elif record_kind == "map":
+        namespace.update(_map_factory=enumap.map_factory())
+    casts = []
+    interned = set()
+    if casted:
+        interned = {i for i, name in enumerate(names)
+                    if name in enumap.interned()}
+        if type_row is None:
+            type_row = enumap._type_row()
+        for i, type_callable in enumerate(type_row):
+            if type_callable is not None:
+                if stats is not None:
+                    type_callable = stats.timed_cast(names[i], type_callable)
+                namespace[f"_cast_{i}"] = type_callable
+                casts.append(i)
+        namespace.update(_cast_error=_cast_error,
+                         _intern=enumap._interner(),
+                         _casts=tuple((i, namespace[f"_cast_{i}"])
+                                      for i in casts),
+                         _interned=tuple(sorted(interned)))
+    wrap = _MAKER_WRAPPERS[record_kind]
+    if record_kind == "map" and enumap.map_factory() is MappingProxyType:
+        wrap = "_map_factory(dict(_zip(_names, {})))".format
+    finish = _source_finisher(wrap, casts, names, interned)
+    source = enumap._maker_source(finish)
+    code = compile(source, f"<enumap {enumap.__name__}.{kind}>", "exec")
+    exec(code, namespace)
+    make = namespace["make"]
+    make.__qualname__ = f"{enumap.__name__}.{kind}"
+    if stats is not None:
+        make = stats.counted(kind, make, len(names))
+    return make
+
+
+class _Tails(dict):
+    """Maps a number of leading values to the rest of `row`, which
+    completes them. Tails are sliced on first use, so wide Enumaps
+    don't keep a tail of every length."""
+
+    def __init__(self, row):
+        super().__init__()
+        self.row = row
+
+    def __missing__(self, n_values):
+        tail = self[n_values] = self.row[n_values:]
+        return tail
+
+
+def _row_getter(names):
+    """Returns a function that gets the values of `names` from a mapping
+    as a tuple. `itemgetter` does the lookups in C, which matters for
+    Enumaps with hundreds of members."""
+    if len(names) > 1:
+        return itemgetter(*names)
+    return lambda mapping: tuple(mapping[name] for name in names)
+
+
+def _replace_row(record, names, constants, calls):
+    """Returns `record` as a list with the `constants` and `calls` of
+    `Enumap._indexed_changes` put in place"""
+    row = list(record)
+    if len(row) != len(names):
+        raise KeyError(f"Record {record!r} doesn't match keys {names}")
+    for i, value in constants:
+        row[i] = value
+    for i, key, call, cast in calls:
+        value = call(row[i])
+        if cast is not None:
+            try:
+                value = cast(value)
+            except Exception as e:
+                raise _cast_error(key, value, e)
+        row[i] = value
+    return row
+
+
+def _iter_replaced(make_tuple, names, records, constants, calls):
+    """Generates a record made with `make_tuple` from each of `records`
+    changed with `_replace_row`. `TypeCastError` is re-raised with the
+    index of the failing record."""
+    for index, record in enumerate(records):
+        try:
+            row = _replace_row(record, names, constants, calls)
+        except TypeCastError as e:
+            raise TypeCastError(f"Row {index}: {e}", e.key, index) from e
+        yield make_tuple(row)
+
+
+def _make_replacer(enumap, casted):
+    """Returns a function like `Enumap.replace` (or `replace_casted`)
+    that takes a record and a dict of changes. The changes are put in
+    place by their member's index in a copy of the record."""
+    names = enumap.names()
+    n_names = len(names)
+    index_of = enumap._indexes()
+    type_row = enumap._type_row()
+    tuple_class = enumap.tuple_class()
+    tuple_new = tuple.__new__
+
+    def invalid_keys_error(changes):
+        invalid = set(changes) - enumap.name_set()
+        return KeyError(f"{enumap.__name__} requires keys {names}; "
+                        f"invalid keys {invalid}")
+
+    def replace(record, changes):
+        row = list(record)
+        if len(row) != n_names:
+            raise KeyError(f"Record {record!r} doesn't match keys {names}")
+        try:
+            for key, value in changes.items():
+                row[index_of[key]] = value
+        except KeyError:
+            raise invalid_keys_error(changes) from None
+        return tuple_new(tuple_class, row)
+
+    def replace_casted(record, changes):
+        row = list(record)
+        if len(row) != n_names:
+            raise KeyError(f"Record {record!r} doesn't match keys {names}")
+        try:
+            for key, value in changes.items():
+                i = index_of[key]
+                cast = type_row[i]
+                if cast is not None:
+                    try:
+                        value = cast(value)
+                    except Exception as e:
+                        raise _cast_error(key, value, e)
+                row[i] = value
+        except KeyError:
+            raise invalid_keys_error(changes) from None
+        return tuple_new(tuple_class, row)
+    return replace_casted if casted else replace
+
+
+def _make_mapping(factory, items):
+    """Calls a mapping `factory` with key/value pairs"""
+    if factory is MappingProxyType:
+        return MappingProxyType(dict(items))
+    return factory(items)
+
+
+def _make_record_class(typename, names, defaults=None):
+    """Makes a mutable record class with `__slots__` for `names`. Its
+    methods are generated like those of `namedtuple`. `defaults` are the
+    default values of the generated `__init__`'s arguments, if any."""
+    for name in names:
+        if (not name.isidentifier() or keyword.iskeyword(name)
+                or name.startswith("_")):
+            raise ValueError(f"Record field names must be identifiers "
+                             f"that aren't keywords and don't start "
+                             f"with '_': {name!r}")
+    fields = "".join(f"{name}, " for name in names)
+    attributes = "".join(f"_self.{name}, " for name in names)
+    init_body = "".join(f"    _self.{name} = {name}\n" for name in names)
+    fields_repr = ", ".join(f"{name}={{_self.{name}!r}}" for name in names)
+    source = f"""\
+def __init__(_self, {fields}):
+{init_body or "    pass"}
+
+def _astuple(_self):
+    return ({attributes})
+
+def __iter__(_self):
+    return iter(({attributes}))
+
+def __repr__(_self):
+    return f"{typename}({fields_repr})"
+
+def __eq__(_self, other):
+    if type(other) is not type(_self):
+        return NotImplemented
+    return _self._astuple() == other._astuple()
+"""
+    namespace = {}
+    code = compile(source, f"<enumap {typename}>", "exec")
+    exec(code, namespace)
+    namespace["__init__"].__defaults__ = defaults
+    class_namespace = dict(namespace, __slots__=names, __hash__=None,
+                           _fields=names)
+    del class_namespace["__builtins__"]
+    return type(typename, (), class_namespace)
+
+
+# Constructors that convert more members than this loop over their casts
+# rather than unrolling them, since compiling unrolled code gets slower
+# than linear in the number of members
+_UNROLLED_CONVERSIONS_MAX = 100
+
+
+def _source_finisher(wrap, casts, names, interned=()):
+    """Returns a function that generates the tail of a constructor:
+    the positions in `casts` of its bound row are converted with their
+    `_cast_<position>` callables, then the row is `wrap`ped into a record.
+    Untyped positions are passed through untouched. Positions that are
+    also `interned` go through `_intern` after their cast, if any.
+    For wide Enumaps, the generated code loops over the `(position, cast)`
+    pairs of `_casts` and the positions of `_interned` instead.
+
+    The `is_present(position, name)` argument of the returned function
+    gives a condition under which a value is casted, if not all of them
+    should be (missing values of a `SparseEnumap`, for example). It's
+    called with source expressions for the position and name.
     """
-    key = None
+    unrolled = len(casts) + len(interned) <= _UNROLLED_CONVERSIONS_MAX
+
+    def converter_lines(positions, convert, indent, is_present):
+        for i in positions:
+            if is_present is None:
+                yield from (f"{indent}{line}" for line in convert(i))
+            else:
+                yield f"{indent}if {is_present(str(i), repr(names[i]))}:"
+                yield from (f"{indent}    {line}" for line in convert(i))
+
+    def unrolled_lines(row, is_present):
+        variables = "".join(f"v{i}, " for i in range(len(names)))
+        lines = [f"row = {row}", f"{variables}= row"]
+        if casts:
+            # only the casts are reported as `TypeCastError`
+            lines.append("try:")
+            lines.extend(converter_lines(
+                sorted(casts),
+                lambda i: [f"i = {i}", f"v{i} = _cast_{i}(v{i})"],
+                "    ", is_present))
+            lines += ["except Exception as e:",
+                      "    raise _cast_error(_names[i], row[i], e)"]
+        lines.extend(converter_lines(
+            sorted(interned), lambda i: [f"v{i} = _intern(v{i})"],
+            "", is_present))
+        lines.append(f"return {wrap(f'({variables})')}")
+        return lines
+
+    def loop_lines(row, is_present):
+        condition = ("" if is_present is None else
+                     f"if {is_present('i', '_names[i]')}: ")
+        lines = [f"row = [*{row}]"]
+        if casts:
+            # a failed cast leaves the original value in place
+            lines += ["try:",
+                      "    for i, cast in _casts:",
+                      f"        {condition}row[i] = cast(row[i])",
+                      "except Exception as e:",
+                      "    raise _cast_error(_names[i], row[i], e)"]
+        if interned:
+            lines += ["for i in _interned:",
+                      f"    {condition}row[i] = _intern(row[i])"]
+        lines.append(f"return {wrap('row')}")
+        return lines
+
+    def finish(row, indent, is_present=None):
+        if not casts and not interned:
+            lines = [f"return {wrap(row)}"]
+        elif unrolled:
+            lines = unrolled_lines(row, is_present)
+        else:
+            lines = loop_lines(row, is_present)
+        # textwrap.indent would do, but textwrap imports the re module
+        return "\n".join(" " * indent + line for line in lines)
+    return finish
+
+
+def _cast_error(key, value, error):
+    value_type = type(value).__name__
+    return TypeCastError(f"Key '{key}' got invalid value '{value}' "
+                         f"of type {value_type} (error: '{error}')", key)
+
+
+def _iter_records(make, rows, start=0):
+    """Generates a record with `make` from each row, which is either
+    positional or a mapping of member names to values.
+    `TypeCastError` is re-raised with the index of the failing row,
+    counting from `start`."""
+    no_named_values = {}
+    for index, row in enumerate(rows, start):
+        try:
+            if isinstance(row, Mapping):
+                yield make((), row)
+            else:
+                yield make(tuple(row), no_named_values)
+        except TypeCastError as e:
+            raise TypeCastError(f"Row {index}: {e}", e.key, index) from e
+
+
+# JSON values are encoded with this separator, which is escaped inside
+# strings, so that a row of scalars splits into one part per value
+_JSON_SPLIT = "\x00"
+
+
+@lru_cache(maxsize=None)
+def _json_encoders():
+    """The `encode` methods of a default JSONEncoder and of one that
+    separates values with `_JSON_SPLIT`"""
+    import json
+
+    return (json.JSONEncoder().encode,
+            json.JSONEncoder(separators=(_JSON_SPLIT, ": ")).encode)
+
+
+def _fill_object_template(encode_array, encode_split, template, names, row):
+    """Fills the JSON object `template` of an Enumap with a `row`"""
+    values = encode_split(row)[1:-1].split(_JSON_SPLIT)
+    if len(values) == len(names):
+        return template % tuple(values)
+    # nested arrays or objects contain the separator too
+    return f"{encode_array(dict(zip(names, row)))}\n"
+
+
+def _iter_json_rows(enumap, lines):
+    """Generates the decoded object or array of each non-blank line,
+    raising `ValueError` for other JSON values"""
+    import json
+
+    for index, line in enumerate(lines):
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        if type(row) not in (dict, list):
+            raise ValueError(f"{enumap.__name__} requires a JSON object "
+                             f"or array; got {line!r} on line {index}")
+        yield row
+
+
+def _iter_chunks(rows, chunk_size):
+    """Generates `(start, chunk)` pairs, where `chunk` is a list of up
+    to `chunk_size` rows and `start` is the index of its first row"""
+    rows = iter(rows)
+    start = 0
+    while True:
+        chunk = [row if isinstance(row, Mapping) else tuple(row)
+                 for row in islice(rows, chunk_size)]
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def _iter_parallel(executor, blueprint, chunks, max_pending, ordered):
+    """Generates the results of `_cast_chunk` for `chunks` with no more
+    than `max_pending` of them submitted to `executor` at once"""
+    pending = deque()
+    for chunk in chunks:
+        if len(pending) >= max_pending:
+            yield from _pop_results(pending, ordered)
+        pending.append(executor.submit(_cast_chunk, blueprint, *chunk))
+    while pending:
+        yield from _pop_results(pending, ordered)
+
+
+def _pop_results(pending, ordered):
+    if ordered:
+        return [pending.popleft().result()]
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        pending.remove(future)
+    return [future.result() for future in done]
+
+
+_worker_blueprint = None
+_worker_make = None
+
+
+def _init_worker(blueprint):
+    """Rebuilds an Enumap from its `Enumap._blueprint` in a worker
+    process and prepares its casting constructor"""
+    global _worker_blueprint, _worker_make
+    _worker_blueprint = blueprint
+    name, names, types, default_row = blueprint
+    if default_row is None:
+        enumap = Enumap(name, names)
+    else:
+        enumap = SparseEnumap(name, names)
+        enumap.set_defaults(*default_row)
+    enumap.set_types(**types)
+    _worker_make = enumap._row_maker("row", casted=True)
+
+
+def _intern_positions(make, intern, positions, row):
+    row = list(row)
+    for i in positions:
+        row[i] = intern(row[i])
+    return make(row)
+
+
+# Only values of these exact types are interned. Equal values of other
+# types can still differ (1 and True, 0.0 and -0.0, Decimal 1.5 and 1.50),
+# so sharing one object between them would change the data.
+_INTERNED_TYPES = frozenset([str, bytes, int])
+
+
+def _make_interner(maxsize):
+    """Returns a function that interns up to `maxsize` distinct str,
+    bytes and int values (any number if None), emptying its table when
+    it's full. Values of other types are returned as they are."""
+    table = {}
+
+    def intern(value):
+        value_type = type(value)
+        if value_type not in _INTERNED_TYPES:
+            return value
+        key = (value_type, value)
+        try:
+            return table[key]
+        except KeyError:
+            if maxsize is not None and len(table) >= maxsize:
+                table.clear()
+            table[key] = value
+            return value
+    return intern
+
+
+def _make_records(make, rows, start=0):
+    return list(_iter_records(make, rows, start))
+
+
+def _cast_chunk(blueprint, start, rows):
+    # the blueprint comes with every chunk rather than through a pool
+    # initializer, which needs Python 3.7; workers rebuild it only once
+    if blueprint != _worker_blueprint:
+        _init_worker(blueprint)
+    return _make_records(_worker_make, rows, start)
+
+
+def _iter_aligned(enumap, header, align, rows):
+    """Generates each of `rows` rearranged with `align` (or as is if
+    it's None), raising `KeyError` for rows that don't have a value
+    for every column of `header`"""
+    n_columns = len(header)
+    for row in rows:
+        if len(row) != n_columns:
+            raise KeyError(
+                f"{enumap.__name__} header {header} has {n_columns} "
+                f"columns, got a row of {len(row)} values")
+        yield row if align is None else align(row)
+
+
+def _iter_lines(fileobj, chunk_size):
+    """Generates the non-empty lines of a text file that's read in
+    chunks of `chunk_size` characters, without a trailing carriage
+    return in case newlines weren't translated"""
+    tail = ""
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        lines = (tail + chunk).split("\n")
+        tail = lines.pop()
+        yield from filter(None, (line.rstrip("\r") for line in lines))
+    tail = tail.rstrip("\r")
+    if tail:
+        yield tail
+
+
+# struct formats for members with these types when no formats are set
+_STRUCT_FORMATS = {int: "q", float: "d", bool: "?"}
+
+# array.array typecodes for the columns of members with these types
+_ARRAY_TYPECODES = {int: "q", float: "d"}
+
+_COLUMNS_CHUNK_SIZE = 4096
+
+
+def _extend_column(columns, key, type_, values):
+    """Extends `columns[key]` with `values`, swapping a compact array
+    column for a list if it can't hold the new values. Arrays only hold
+    values that are exactly of `type_`, so that others, like True in
+    an `int` column or a Decimal in a `float` one, aren't converted."""
+    column = columns[key]
+    if isinstance(column, list):
+        column.extend(values)
+        return
+    n_values = len(column)
+    try:
+        if set(map(type, values)) != {type_}:
+            raise TypeError(f"Column '{key}' has values that aren't "
+                            f"{type_.__name__}s")
+        column.extend(values)
+    except (TypeError, OverflowError):
+        del column[n_values:]
+        column = columns[key] = column.tolist()
+        column.extend(values)
+
+
+def _cast_column(key, type_, column):
+    """Casts each value of `column` with `type_`. A `TypeCastError`
+    names `key` and the index of the first value that fails.
+    NumPy arrays are converted in one go if that can't lose data."""
+    field_type = _NUMPY_FIELD_TYPES.get(type_)
+    # numpy is only imported here if something else already has; a
+    # column can't be an ndarray otherwise
+    numpy = sys.modules.get("numpy")
+    if (numpy is not None and isinstance(column, numpy.ndarray)
+            and field_type is not None
+            and numpy.can_cast(column.dtype, field_type)):
+        return column.astype(field_type)
     try:
-        for key, type_callable in types.items():
-            yield key, type_callable(mapping[key])
-    except Exception as e:
-        value = mapping.get(key)
-        value_type = type(value).__name__
-        raise TypeCastError(f"Key '{key}' got invalid value '{value}' "
-                            f"of type {value_type} (error: '{e}')", key)
+        values = list(map(type_, column))
+    except Exception:
+        for index, value in enumerate(column):
+            try:
+                type_(value)
+            except Exception as e:
+                error = _cast_error(key, value, e)
+                raise TypeCastError(f"Row {index}: {error}",
+                                    key, index) from e
+        raise
+    typecode = _ARRAY_TYPECODES.get(type_)
+    if typecode:
+        try:
+            return array.array(typecode, values)
+        except (TypeError, OverflowError):
+            pass
+    return values
+
+
+def _repeat_column(type_, value, n_rows):
+    """A column of `n_rows` repeats of a default `value`"""
+    typecode = _ARRAY_TYPECODES.get(type_)
+    if typecode and type(value) is type_:
+        return array.array(typecode, (value,)) * n_rows
+    return [value] * n_rows
+
+
+# NumPy field types for members with these types; other members
+# are stored as Python objects
+_NUMPY_FIELD_TYPES = {int: "i8", float: "f8", bool: "?"}
+
+
+def _numpy_field_type(type_callable):
+    try:
+        return _NUMPY_FIELD_TYPES[type_callable]
+    except KeyError:
+        pass
+    numpy = sys.modules["numpy"]
+    if isinstance(type_callable, type) and issubclass(type_callable,
+                                                      numpy.generic):
+        return type_callable
+    return object
+
+
+def _require_numpy(feature):
+    """Imports numpy, which is only needed for structured arrays"""
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(f"Enumap.{feature} requires numpy") from None
+    return numpy
+
+
+_RECORD_FILE_MAGIC = b"ENUMAP\x00\x01"
+
+_RECORDS_CHUNK_SIZE = 4096
+
+
+class RecordFile:
+    """Random access to the records of a file written by
+    `Enumap.write_records`. The file is memory-mapped, so records are
+    only read from disk as they're accessed. Indexing gives a `tuple`
+    of the Enumap; slicing gives a list of them.
+    """
+
+    def __init__(self, enumap, path):
+        import mmap
+
+        self.enumap = enumap
+        with open(path, "rb") as fileobj:
+            self._mmap = mmap.mmap(fileobj.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        try:
+            self._offset = self._check_header()
+        except Exception:
+            self._mmap.close()
+            raise
+        self._struct = enumap.record_struct()
+        self._make = partial(tuple.__new__, enumap.tuple_class())
+        n_bytes = len(self._mmap) - self._offset
+        self._len, remainder = divmod(n_bytes, self._struct.size)
+        if remainder:
+            self._mmap.close()
+            raise ValueError(f"{path} ends with a partial record")
+
+    def _check_header(self):
+        """Validates the header against the Enumap and returns
+        the offset of the first record"""
+        import json
+
+        enumap = self.enumap
+        magic_size = len(_RECORD_FILE_MAGIC)
+        if self._mmap[:magic_size] != _RECORD_FILE_MAGIC:
+            raise ValueError(f"Not an {enumap.__name__} record file")
+        start = magic_size + 4
+        header_size = int.from_bytes(self._mmap[magic_size:start], "little")
+        header = json.loads(self._mmap[start:start + header_size])
+        names = enumap.names()
+        stored_names = tuple(header["names"])
+        if stored_names != names:
+            raise KeyError(f"{enumap.__name__} requires keys {names}; "
+                           f"file has keys {stored_names}")
+        fmt = enumap.record_format()
+        if header["format"] != fmt:
+            raise ValueError(f"{enumap.__name__} requires format {fmt!r}; "
+                             f"file has format {header['format']!r}")
+        return start + header_size
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            size = self._struct.size
+            begin = self._offset + start * size
+            end = self._offset + max(start, stop) * size
+            with memoryview(self._mmap) as view, view[begin:end] as rows:
+                return list(map(self._make, self._struct.iter_unpack(rows)))
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("record index out of range")
+        offset = self._offset + index * self._struct.size
+        return self._make(self._struct.unpack_from(self._mmap, offset))
+
+    def __iter__(self):
+        # records are unpacked a chunk at a time so that no view of the
+        # mmap is held between iterations, which would keep it from closing
+        for start in range(0, self._len, _RECORDS_CHUNK_SIZE):
+            yield from self[start:start + _RECORDS_CHUNK_SIZE]
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _Stats:
+    """Counters of an Enumap with stats enabled. Its constructors are
+    wrapped so that they update them. See `Enumap.enable_stats`."""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.fast_path = 0
+        self.fallback = 0
+        self.cast_seconds = Counter()
+        self.cast_errors = Counter()
+
+    def counted(self, kind, make, n_names):
+        """Wraps the `kind` constructor `make` to count its calls and
+        casting errors. Successful calls count as `fast_path` if they
+        gave exactly `n_names` positional values and no keywords, and
+        as `fallback` if values had to be bound or filled in."""
+        calls = self.calls
+        cast_errors = self.cast_errors
+
+        def counted_make(values, named_values):
+            calls[kind] += 1
+            try:
+                record = make(values, named_values)
+            except TypeCastError as e:
+                cast_errors[e.key] += 1
+                raise
+            if named_values or len(values) != n_names:
+                self.fallback += 1
+            else:
+                self.fast_path += 1
+            return record
+        return counted_make
+
+    def timed_cast(self, key, type_callable):
+        """Wraps the `type_callable` of `key` to time its casts"""
+        cast_seconds = self.cast_seconds
+
+        def timed_type_callable(value):
+            start = perf_counter()
+            try:
+                return type_callable(value)
+            finally:
+                cast_seconds[key] += perf_counter() - start
+        return timed_type_callable
+
+    def as_dict(self):
+        return dict(calls=dict(self.calls),
+                    fast_path=self.fast_path,
+                    fallback=self.fallback,
+                    cast_seconds=dict(self.cast_seconds),
+                    cast_errors=dict(self.cast_errors))
+
+
+# Enumaps with stats enabled, see `collect_stats`
+_instrumented = weakref.WeakSet()
+
+
+def collect_stats():
+    """Returns the `Enumap.stats` of every Enumap with stats enabled,
+    keyed by the Enumap class itself, since names aren't unique"""
+    return {enumap: enumap.stats() for enumap in list(_instrumented)}
+
+
+def cached(type_callable, maxsize=4096):
+    """Wraps `type_callable` so that it runs once per distinct raw value,
+    keeping the results of the `maxsize` most recently used values.
+    Use it with `set_types` or in annotations for expensive casts of
+    values that repeat a lot. Raw values must be hashable.
+
+    >>> Order.set_types(status=cached(Status), cost=cached(Decimal))
+    >>> Order.cast_cache_info()["cost"]
+    CacheInfo(hits=9998, misses=2, maxsize=4096, currsize=2)
+    """
+    return _CachedCast(type_callable, maxsize)
+
+
+class _CachedCast:
+    """A `type_callable` wrapped with `cached`. It pickles as a call to
+    `cached`, so it can be used with `Enumap.tuples_parallel`; each
+    process gets a cache of its own."""
+
+    def __init__(self, type_callable, maxsize):
+        self.type_callable = type_callable
+        self.maxsize = maxsize
+        self.__name__ = getattr(type_callable, "__name__",
+                                type(type_callable).__name__)
+        # the cache wraps a closure rather than `type_callable` itself,
+        # so that the attributes of classes like Decimal aren't copied
+        self._cast = lru_cache(maxsize, typed=True)(
+            lambda value: type_callable(value))
+        self.cache_info = self._cast.cache_info
+        self.cache_clear = self._cast.cache_clear
+
+    def __call__(self, value):
+        return self._cast(value)
+
+    def __reduce__(self):
+        return cached, (self.type_callable, self.maxsize)
+
+    def __eq__(self, other):
+        if type(other) is not _CachedCast:
+            return NotImplemented
+        return ((self.type_callable, self.maxsize) ==
+                (other.type_callable, other.maxsize))
+
+    def __hash__(self):
+        return hash((self.type_callable, self.maxsize))
+
+    def __repr__(self):
+        return f"cached({self.type_callable!r}, maxsize={self.maxsize})"
+
+
+class Converter:
+    """Converts records of one Enumap to `tuple`s of another, see
+    `Enumap.converter`. Call it with a record or use `many` for an
+    iterable of records."""
+
+    def __init__(self, convert):
+        self.convert = convert
+
+    def __call__(self, record):
+        return self.convert(record)
+
+    def many(self, records):
+        """Generates a converted `tuple` for each of `records`"""
+        return map(self.convert, records)
 
 
 class TypeCastError(TypeError):
@@ -191,11 +1944,17 @@ class TypeCastError(TypeError):
     Attributes
         key: key or field name for which a value could not be
              successfully type casted
+        row: index of the offending row for bulk methods like
+             Enumap.tuples, otherwise None
     """
 
-    def __init__(self, message, key):
+    def __init__(self, message, key, row=None):
         super().__init__(message)
         self.key = key
+        self.row = row
+
+    def __reduce__(self):
+        return type(self), (str(self), self.key, self.row)
 
 
 class default(enum.auto):
@@ -218,7 +1977,8 @@ class default(enum.auto):
     """
 
     def __init__(self, default_value=None):
-        self._value = (enum.auto.value, default_value)
+        # `enum.auto.value` is a class attribute only on older Pythons
+        self._value = (getattr(enum.auto, "value", None), default_value)
 
     @property
     def value(self):
@@ -273,7 +2033,13 @@ class SparseEnumap(Enumap, metaclass=SparseEnumapMeta):
 
     @classmethod
     def set_defaults(cls, *values, **named_values):
-        cls.__member_defaults = cls.map(*values, **named_values)
+        member_defaults = dict(cls.defaults(),
+                               **cls._sparse_map(values, named_values))
+        cls.__member_defaults = _make_mapping(
+            cls.map_factory(), member_defaults.items())
+        if "_SparseEnumap__default_row" in cls.__dict__:
+            del cls.__default_row
+        cls._reset_makers()
 
     @classmethod
     def defaults(cls):
@@ -281,83 +2047,83 @@ class SparseEnumap(Enumap, metaclass=SparseEnumapMeta):
             return cls.__member_defaults
         except AttributeError:
             members = cls.__members__
-            defaults_spec = Enumap("_Defaults", cls.names())
             declared_defaults = dict(_iter_member_defaults(members))
-            member_defaults = defaults_spec.map(
-                *[None] * len(cls), **declared_defaults)
+            member_defaults = _make_mapping(
+                cls.map_factory(),
+                ((k, declared_defaults.get(k)) for k in cls.names()))
             cls.__member_defaults = member_defaults
             return cls.__member_defaults
 
     @classmethod
-    def _make_checked_mapping(cls, *values, **named_values):
-        """Generate key-value pairs where keys are strictly the names
-        of the members of this Enum. Raises `KeyError` for both
-        missing and invalid keys."""
-        names = cls.names()
-        names_set = set(names)
-        defaults = cls.defaults()
+    def set_map_factory(cls, factory):
+        super().set_map_factory(factory)
+        if "_SparseEnumap__member_defaults" in cls.__dict__:
+            cls.__member_defaults = _make_mapping(
+                factory, cls.__member_defaults.items())
 
-        # Create a mapping which will be a subset of the final,
-        # sparse mapping. As we go, record which values are present
-        # in the mapping and which are missing.
-        if defaults:
-            mapping = dict(zip(names, values), **named_values)
-            missing = names_set - set(mapping)
-            mapping.update(((k, defaults[k]) for k in missing))
-        else:
-            mapping = dict(zip_longest(names, values), **named_values)
+    @classmethod
+    def _maker_source(cls, finish):
+        """Source of a function that binds positional and keyword
+        values to a row ordered like this Enum's members. Missing
+        values are taken from `defaults()` and are never casted;
+        invalid keys raise `KeyError`.
 
-        # If we haven't been passed invalid keys and we haven't been
-        # passed too many positional arguments, return the mapping
-        if set(mapping) == names_set and len(values) <= len(names):
-            return mapping
+        Keyword values are patched by index into a copy of the default
+        row, so records that give a few of many members are cheap.
+        """
+        names = cls.names()
+        n_names = len(names)
+        return f"""\
+def make(values, named_values):
+    n_values = len(values)
+    if not named_values:
+        if n_values <= {n_names}:
+            values += _default_tails[n_values]
+{finish("values", 12, lambda i, name: f"n_values > {i}")}
+        mapping = dict(_zip(_names, values))
+    elif not values:
+        mapping = named_values
+        row = [*_defaults]
+        try:
+            for key, value in mapping.items():
+                row[_index_of[key]] = value
+        except KeyError:
+            pass
         else:
-            cls._raise_invalid_args(values, mapping, names)
+{finish("row", 12, lambda i, name: f"{name} in mapping")}
+    else:
+        if n_values <= {n_names}:
+            row = [*values, *_default_tails[n_values]]
+            try:
+                for key, value in named_values.items():
+                    row[_index_of[key]] = value
+            except KeyError:
+                pass
+            else:
+{finish("row", 16,
+        lambda i, name: f"n_values > {i} or {name} in named_values")}
+        mapping = dict(_zip(_names, values), **named_values)
+    _raise_invalid_args(values, mapping, _names)
+"""
 
     @classmethod
-    def _make_casted_mapping(cls, *values, **named_values):
-        """Like `_make_checked_mapping`, but values are casted based
-        on the `types()` mapping"""
-        names = cls.names()
-        names_set = set(names)
-        defaults = cls.defaults()
+    def _default_row(cls):
+        try:
+            default_row = cls.__default_row
+        except AttributeError:
+            defaults = cls.defaults()
+            default_row = cls.__default_row = tuple(
+                defaults[k] for k in cls.names())
+        return default_row
 
-        # Create a mapping which will be a subset of the final,
-        # sparse mapping. As we go, record which values are present
-        # in the mapping and which are missing.
-        if defaults:
-            mapping = dict(zip(names, values), **named_values)
-            present = set(mapping)
-            missing = names_set - present
-            mapping.update(((k, defaults[k]) for k in missing))
-        else:
-            mapping = dict(zip(names, values), **named_values)
-            present = set(mapping)
-            missing = names_set - present
-
-        # Cast the values of our mapping with the the type function
-        # corresponding to their keys. We use the `missing` set of keys
-        # as a guide here because we don't want to cast missing or default
-        # values.
-        types = cls.types()
-        if types:
-            present_typed = present & set(types)
-            relevant_types = {key: types[key] for key in present_typed}
-            mapping.update(_type_cast_items(mapping, relevant_types))
-
-        # Handle default values to create a sparse mapping.
-        # Missing values will either be filled in with what's in the
-        # `defaults` mapping or with None if the user hasn't set defaults.
-        temp = dict(defaults) or {}.fromkeys(names)
-        temp.update(mapping)
-        mapping = temp
-
-        # If we haven't been passed invalid keys and we haven't been
-        # passed too many positional arguments, return the mapping
-        if not present - names_set and len(values) <= len(names):
-            return mapping
-        else:
-            cls._raise_invalid_args(values, mapping, names)
+    @classmethod
+    def _maker_namespace(cls):
+        namespace = super()._maker_namespace()
+        default_row = cls._default_row()
+        default_tails = _Tails(default_row)
+        namespace.update(_defaults=default_row,
+                         _default_tails=default_tails)
+        return namespace
 
     @classmethod
     def _raise_invalid_args(cls, values, mapping, names):
@@ -1,10 +1,16 @@
 """Unit tests. Run with `py.test test.py -v`."""
 
+import asyncio
+import io
+import pickle
 import pytest
+from array import array
 from collections import OrderedDict
 from decimal import Decimal
 from enum import auto
-from enumap import Enumap, SparseEnumap, default, TypeCastError
+from types import MappingProxyType
+from enumap import (Enumap, SparseEnumap, default, TypeCastError,
+                    cached, collect_stats)
 
 
 def test_map():
@@ -13,11 +19,56 @@ def test_map():
             OrderedDict([('b', 1), ('c', 2), ('e', 33)]))
 
 
+def test_map_factory():
+    a = SparseEnumap("a", names="b c e")
+    a.set_defaults(e=3)
+    assert type(a.map(1)) is OrderedDict
+    a.set_map_factory(dict)
+    assert type(a.map(1)) is dict
+    assert type(a.defaults()) is dict
+    assert list(a.map(e=1, c=2, b=3).items()) == [("b", 3), ("c", 2),
+                                                  ("e", 1)]
+    a.set_map_factory(MappingProxyType)
+    assert a.map_casted(1) == dict(b=1, c=None, e=3)
+    with pytest.raises(TypeError):
+        a.maps([[1]], lazy=False)[0]["b"] = 2
+
+
 def test_tuple():
     a = Enumap("a", names="b c e")
     assert a.tuple(1, 2, 3, e=33) == (1, 2, 33)
 
 
+def test_tuple_override():
+    a = Enumap("a", names="b c e")
+    assert a.tuple(1, 2, 3, b=11, e=33) == (11, 2, 33)
+    assert a.tuple(c=2, e=3, b=1) == (1, 2, 3)
+
+
+def test_positional_with_keywords():
+    """Keywords can both override and complete positional values"""
+    a = Enumap("a", names="b c e")
+    assert a.tuple(1, e=3, c=2) == (1, 2, 3)
+    with pytest.raises(KeyError) as ke:
+        a.tuple(1, b=2, c=3)
+    assert "missing keys {'e'}" in str(ke)
+    with pytest.raises(KeyError) as ke:
+        a.tuple(1, 2, 3, f=4)
+    assert "invalid keys {'f'}" in str(ke)
+    b = SparseEnumap("b", names="b c e")
+    b.set_types(int, int, int)
+    b.set_defaults(e="default")
+    assert b.tuple_casted("1", c="2") == (1, 2, "default")
+    assert b.tuple_casted("1", "2", "3", b="4") == (4, 2, 3)
+
+
+def test_map_non_identifier_names():
+    """Generated constructors must cope with names that aren't
+    valid Python identifiers"""
+    a = Enumap("a", names=["b c", "class"])
+    assert a.map(1, **{"class": 2}) == OrderedDict([("b c", 1), ("class", 2)])
+
+
 def test_ordering():
     a = Enumap("forward", names=["n" + str(i) for i in range(100)])
     b = Enumap("backward", names=["n" + str(i) for i in range(99, -1, -1)])
@@ -57,6 +108,15 @@ def test_tuple_casted_1():
     assert a.tuple_casted(*"1 2.2 3.3".split(), b=2.2) == (2, 2, 3.0)
 
 
+def test_set_types_after_use():
+    """Check that casted constructors pick up types set after use"""
+    a = Enumap("a", names="b c e")
+    assert a.tuple_casted("1", "2", "3") == ("1", "2", "3")
+    a.set_types(int, e=float)
+    assert a.tuple_casted("1", "2", "3") == (1, "2", 3.0)
+    assert a.map_casted("1", "2", e="3") == dict(b=1, c="2", e=3.0)
+
+
 def test_annotated_tuple_casted():
     class Order(str, Enumap):
         index: int = "Order ID"
@@ -77,10 +137,700 @@ def test_annotated_map_casted():
             dict(index=12, cost=Decimal("142.22"), due_on="2017-04-07"))
 
 
+def test_tuples():
+    a = Enumap("a", names="b c e")
+    a.set_types(int, float)
+    rows = ["1 2 3".split(), "4 5 6".split()]
+    tuples = a.tuples(rows)
+    assert not isinstance(tuples, list)
+    assert list(tuples) == [("1", "2", "3"), ("4", "5", "6")]
+    assert a.tuples(rows, casted=True, lazy=False) == [(1, 2.0, "3"),
+                                                       (4, 5.0, "6")]
+
+
+def test_maps_sparse():
+    a = SparseEnumap("a", names="b c e")
+    a.set_defaults(e=0)
+    a.set_types(int, int)
+    assert (a.maps([["1"], ["2", "3"]], casted=True, lazy=False) ==
+            [dict(b=1, c=None, e=0), dict(b=2, c=3, e=0)])
+
+
+def test_tuples_type_cast_exception():
+    """Bulk methods should report the index of the row that failed"""
+    a = Enumap("a", names="b c")
+    a.set_types(int, int)
+    with pytest.raises(TypeCastError) as e:
+        a.tuples([("1", "2"), ("3", "4"), ("5", "six")], casted=True,
+                 lazy=False)
+    assert "Row 2: Key 'c' got invalid value 'six'" in str(e)
+    assert e.value.key == "c"
+    assert e.value.row == 2
+
+
+def test_columns():
+    a = SparseEnumap("a", names="b c e")
+    a.set_types(int, float)
+    a.set_defaults(e="nope")
+    columns = a.columns([("1", "2"), dict(b="3", c="4", e="5")], casted=True)
+    assert list(columns) == ["b", "c", "e"]
+    assert columns["b"] == array("q", [1, 3])
+    assert columns["c"] == array("d", [2.0, 4.0])
+    assert columns["e"] == ["nope", "5"]
+
+
+def test_columns_array_fallback():
+    """Typed columns become lists when their values don't fit an array"""
+    a = SparseEnumap("a", names="b c")
+    a.set_types(int, int)
+    columns = a.columns([("1", "2"), ("3",)], casted=True)
+    assert columns["b"] == array("q", [1, 3])
+    assert columns["c"] == [2, None]
+    assert a.columns([]) == OrderedDict([("b", array("q")), ("c", array("q"))])
+
+
+def test_columns_keep_values():
+    """Uncasted values of other types aren't converted by arrays"""
+    from fractions import Fraction
+
+    a = Enumap("a", names="b c")
+    a.set_types(int, float)
+    rows = [(1, 0.5), (True, Decimal("1.1")), (2, Fraction(1, 3))]
+    columns = a.columns(rows)
+    assert columns["b"] == [1, True, 2]
+    assert type(columns["b"][1]) is bool
+    assert columns["c"] == [0.5, Decimal("1.1"), Fraction(1, 3)]
+    assert [tuple(r) for r in zip(*columns.values())] == list(a.tuples(rows))
+    assert a.columns([(1, 0.5)])["b"] == array("q", [1])
+
+
+def test_cached_types():
+    calls = []
+
+    def money(value):
+        calls.append(value)
+        return Decimal(value)
+
+    class a(Enumap):
+        b: cached(money, maxsize=2) = auto()
+        c = auto()
+
+    assert a.tuple_casted("1.5", "x").b == Decimal("1.5")
+    for value in ("2", "1.5"):
+        a.tuple_casted(value, "x")
+    assert calls == ["1.5", "2"]
+    info = a.cast_cache_info()["b"]
+    assert (info.hits, info.misses, info.currsize) == (1, 2, 2)
+    a.tuple_casted("3", "x")
+    a.tuple_casted("1.5", "x")
+    assert calls == ["1.5", "2", "3"]
+    assert a.cast_cache_info()["b"].currsize == 2
+    a.set_types(c=cached(int))
+    assert list(a.cast_cache_info()) == ["c"]
+
+
+def test_cached_types_pickle():
+    for type_callable in (int, Decimal):
+        cast = cached(type_callable, maxsize=8)
+        copy = pickle.loads(pickle.dumps(cast))
+        assert copy == cast
+        assert copy("2") == type_callable("2")
+        assert copy.cache_info().maxsize == 8
+    a = Enumap("a", names="b c")
+    a.set_types(b=cached(Decimal), c=cached(int))
+    rows = [("1.5", str(i % 3)) for i in range(200)]
+    assert (list(a.tuples_parallel(rows, chunk_size=50, max_workers=2)) ==
+            list(a.tuples(rows, casted=True)))
+
+
+def test_wide_casted_loop():
+    """Casts of wide Enumaps are looped over rather than unrolled"""
+    names = [f"b{i}" for i in range(150)]
+    a = Enumap("a", names)
+    a.set_types(*[int] * 149)
+    a.set_interned("b149")
+    row = [str(i) for i in range(150)]
+    record = a.tuple_casted(*row)
+    assert record == (*range(149), "149")
+    assert a.tuple_casted(*row[:-1], b149="x").b149 == "x"
+    assert a.map_casted(**dict(zip(names, row)))["b7"] == 7
+    with pytest.raises(TypeCastError) as tce:
+        a.tuple_casted(*row[:120], "x", *row[121:])
+    assert tce.value.key == "b120"
+    assert "'x'" in str(tce.value)
+    sparse = SparseEnumap("sparse", names)
+    sparse.set_types(*[int] * 150)
+    sparse.set_defaults(b149="not casted")
+    assert sparse.tuple_casted("1", b2="2") == (
+        1, None, 2, *[None] * 146, "not casted")
+    assert sparse.tuple_casted(*row[:5])[:6] == (0, 1, 2, 3, 4, None)
+    with pytest.raises(TypeCastError) as tce:
+        sparse.tuple_casted(b3="x")
+    assert tce.value.key == "b3"
+
+
+def test_sparse_keywords_patch_defaults():
+    a = SparseEnumap("a", names=[f"b{i}" for i in range(40)])
+    a.set_types(b1=int, b39=int)
+    a.set_defaults(b39="9", b20="x")
+    assert a.tuple_casted(b1="1", b2="2") == (
+        None, 1, "2", *[None] * 17, "x", *[None] * 18, "9")
+    record = a.record(b0=0, b39=39)
+    assert (record.b0, record.b20, record.b39) == (0, "x", 39)
+    a.set_defaults(b0="zero")
+    assert a.map(b1=1)["b0"] == "zero"
+    with pytest.raises(KeyError):
+        a.tuple(b1=1, nope=2)
+
+
+def test_replace():
+    a = Enumap("a", names="b c d")
+    a.set_types(int, float)
+    record = a.tuple(1, 2.0, "x")
+    assert a.replace(record, d="y") == (1, 2.0, "y")
+    assert type(a.replace(record, d="y")) is a.tuple_class()
+    assert a.replace_casted(a.record(1, 2.0, "x"), b="5") == (5, 2.0, "x")
+    with pytest.raises(KeyError) as ke:
+        a.replace(record, e=1)
+    assert "invalid keys {'e'}" in str(ke)
+    with pytest.raises(KeyError):
+        a.replace((1, 2), d=3)
+    r = Enumap("r", names="record casted")
+    assert r.replace((1, 2), record=5, casted=6) == (5, 6)
+    with pytest.raises(TypeCastError) as tce:
+        a.replace_casted(record, b="x")
+    assert tce.value.key == "b"
+    with pytest.raises(KeyError):
+        a.replace_casted(record, e="1")
+    a.set_types(b=str)
+    assert a.replace_casted(record, b=5) == ("5", 2.0, "x")
+
+
+def test_replace_many():
+    a = Enumap("a", names="b c d")
+    a.set_types(int, float)
+    records = [(1, 2.5, "x"), (3, 4.5, "y")]
+    assert list(a.replace_many(records, c=round, d="z")) == [
+        (1, 2, "z"), (3, 4, "z")]
+    assert list(a.replace_many(records, casted=True, b=str, c="1")) == [
+        (1, 1.0, "x"), (3, 1.0, "y")]
+    with pytest.raises(TypeCastError) as tce:
+        list(a.replace_many([(1, 2, 3), ("x", 2, 3)], True, b=str))
+    assert tce.value.row == 1
+    assert tce.value.key == "b"
+    with pytest.raises(ZeroDivisionError) as zde:
+        list(a.replace_many(records, c=lambda value: value / 0))
+    assert not hasattr(zde.value, "row")
+    with pytest.raises(KeyError):
+        a.replace_many([], nope=1)
+    with pytest.raises(TypeCastError):
+        a.replace_many(records, casted=True, b="x")
+
+
+def test_jsonl_round_trip():
+    a = SparseEnumap("a", names="b c d")
+    a.set_types(int)
+    a.set_defaults(d="x")
+    text = a.dumps_jsonl([(1, "two\x00"), dict(d=[1, 2], b=3)])
+    assert text == ('{"b": 1, "c": "two\\u0000", "d": "x"}\n'
+                    '{"b": 3, "c": null, "d": [1, 2]}\n')
+    assert list(a.loads_jsonl(text.splitlines())) == [
+        (1, "two\x00", "x"), (3, None, [1, 2])]
+    positional = a.dumps_jsonl([("4", 5)], positional=True)
+    assert positional == '["4", 5, "x"]\n'
+    assert list(a.loads_jsonl(["", positional], casted=True)) == [(4, 5, "x")]
+
+
+def test_jsonl_bad_keys():
+    a = Enumap("a", names="b c")
+    with pytest.raises(KeyError):
+        a.dumps_jsonl([(1, 2, 3)])
+    with pytest.raises(KeyError):
+        list(a.loads_jsonl(['{"b": 1, "d": 2}']))
+    for line in ('"12"', "5", "null"):
+        with pytest.raises(ValueError) as ve:
+            list(a.loads_jsonl(["[1, 2]", "", line]))
+        assert "on line 2" in str(ve)
+
+
+def test_interned():
+    a = Enumap("a", names="host status size")
+    a.set_types(size=int)
+    a.set_interned("host", "size", maxsize=2)
+    assert a.interned() == frozenset(["host", "size"])
+    lines = ["web1 ok 1000", "web1 ok 1000", "web2 ok 5"]
+    first, second, third = a.tuples((l.split() for l in lines), casted=True)
+    assert first == second == ("web1", "ok", 1000)
+    assert first.host is second.host
+    assert first.size is second.size
+    assert first.status is not second.status
+    assert a.tuple(*lines[0].split()).host is not first.host
+    hosts = ["".join(["web", "3"]) for _ in range(2)]
+    columns = a.cast_columns(dict(host=hosts, status=["", ""], size=[1, 1]))
+    assert columns["host"][0] is columns["host"][1]
+    assert columns["size"] == array("q", [1, 1])
+    with pytest.raises(KeyError):
+        a.set_interned("nope")
+    a.set_interned("host", maxsize=None)
+    first, second = a.tuples([("web1", "ok", "1"), ("".join(["web", "1"]),
+                                                    "ok", "1")], casted=True)
+    assert first.host == "web1"
+    assert first.host is second.host
+    columns = a.cast_columns(dict(host=["x", "y"], status=["", ""],
+                                  size=["1", "2"]))
+    assert columns["host"] == ["x", "y"]
+
+
+def test_interned_keeps_equal_values_of_other_types():
+    a = Enumap("a", names="x y")
+    a.set_types(x=Decimal)
+    a.set_interned("x", "y")
+    rows = list(a.tuples([("1.50", 1), ("1.5", True), ("1.500", 1.0)],
+                         casted=True))
+    assert [(str(r.x), r.y) for r in rows] == [
+        ("1.50", 1), ("1.5", True), ("1.500", 1.0)]
+    assert [type(r.y) for r in rows] == [int, bool, float]
+    b = Enumap("b", names="flag")
+    b.set_interned("flag")
+    flags = [r.flag for r in b.loads_jsonl(["[1]", "[true]", "[1.0]"],
+                                           casted=True)]
+    assert [type(flag) for flag in flags] == [int, bool, float]
+    assert b.tuple_casted([1, 2]).flag == [1, 2]
+
+
+def test_interned_cast_error():
+    a = Enumap("a", names="x y")
+    a.set_types(x=int)
+    a.set_interned("x", "y")
+    assert a.tuple_casted("1", ["unhashable"]) == (1, ["unhashable"])
+    with pytest.raises(TypeCastError) as tce:
+        a.tuple_casted("nope", "y")
+    assert tce.value.key == "x"
+
+
+def test_cast_columns():
+    a = SparseEnumap("a", names="b c d e")
+    a.set_types(int, float, str)
+    a.set_defaults(c=1.5)
+    columns = a.cast_columns(dict(d=[1, 2], b=("3", "4")))
+    assert list(columns) == ["b", "c", "d", "e"]
+    assert columns["b"] == array("q", [3, 4])
+    assert columns["c"] == array("d", [1.5, 1.5])
+    assert columns["d"] == ["1", "2"]
+    assert columns["e"] == [None, None]
+    with pytest.raises(TypeCastError) as tce:
+        a.cast_columns(dict(b=["1", "2", "x"]))
+    assert tce.value.key == "b"
+    assert tce.value.row == 2
+    with pytest.raises(KeyError):
+        Enumap("f", names="g h").cast_columns(dict(g=[1]))
+    with pytest.raises(ValueError):
+        a.cast_columns(dict(b=[1], c=[1, 2]))
+
+
+def test_cast_columns_numpy():
+    numpy = pytest.importorskip("numpy")
+    a = Enumap("a", names="b c")
+    a.set_types(int, float)
+    columns = a.cast_columns(dict(b=numpy.array([1, 2]),
+                                  c=numpy.array([1, 2])))
+    assert columns["c"].dtype == numpy.float64
+    with pytest.raises(TypeCastError) as tce:
+        a.cast_columns(dict(b=numpy.array([1.0, float("nan")]), c=[1, 2]))
+    assert tce.value.row == 1
+    truncated = a.cast_columns(dict(b=numpy.array([1.7]), c=[1]))
+    assert truncated["b"] == array("q", [1])
+
+
+def test_to_structured():
+    numpy = pytest.importorskip("numpy")
+    a = SparseEnumap("a", names="b c d e")
+    a.set_types(int, float, Decimal)
+    a.set_defaults(b=0, c=1.5)
+    structured = a.to_structured([("1", "2", "3.3", "x"), ("4",)])
+    assert structured.dtype.names == ("b", "c", "d", "e")
+    assert structured["b"].tolist() == [1, 4]
+    assert structured["c"].tolist() == [2.0, 1.5]
+    assert structured["d"][0] == Decimal("3.3")
+    assert structured["e"].tolist() == ["x", None]
+    assert a.from_structured(structured)[1] == (4, 1.5, None, None)
+    assert numpy.issubdtype(structured["b"].dtype, numpy.integer)
+    a.set_defaults(d=0)
+    structured = a.to_structured([("1", "2", 0), ("4",)])
+    assert structured["d"].tolist() == [Decimal("0"), 0]
+    assert type(structured["d"][0]) is Decimal
+
+
+def test_to_structured_casts_only_object_fields():
+    pytest.importorskip("numpy")
+    a = Enumap("a", names="b c d")
+    a.set_types(int, float, Decimal)
+    a.enable_stats()
+    structured = a.to_structured([("1", "2.5", "3.3"), ("4", "5", "6")])
+    assert structured["b"].tolist() == [1, 4]
+    assert structured["c"].tolist() == [2.5, 5.0]
+    assert structured["d"].tolist() == [Decimal("3.3"), Decimal("6")]
+    assert list(a.stats()["cast_seconds"]) == ["d"]
+    with pytest.raises(TypeCastError) as tce:
+        a.to_structured([("1", "2", "x")])
+    assert tce.value.key == "d"
+    with pytest.raises(TypeCastError) as tce:
+        a.to_structured([("1", "2", "3"), ("4", "five", "6")])
+    assert (tce.value.key, tce.value.row) == ("c", 1)
+    assert str(tce.value).startswith("Row 1: Key 'c' got invalid value")
+
+
+def test_to_structured_none_defaults():
+    numpy = pytest.importorskip("numpy")
+    a = SparseEnumap("a", names="b c d")
+    a.set_types(int, float, bool)
+    structured = a.to_structured([("1", "2", "1"), ()])
+    assert structured.dtype["b"] == object
+    assert structured.dtype["c"] == numpy.float64
+    assert structured.dtype["d"] == object
+    assert structured["b"].tolist() == [1, None]
+    assert numpy.isnan(structured["c"][1])
+    assert structured["d"].tolist() == [True, None]
+
+
+def test_from_structured_reordered():
+    numpy = pytest.importorskip("numpy")
+    a = Enumap("a", names="b c")
+    structured = numpy.array([(1, 2.0)], dtype=[("c", "i8"), ("b", "f8")])
+    assert a.from_structured(structured) == [(2.0, 1)]
+    with pytest.raises(KeyError):
+        Enumap("z", names="b").from_structured(structured)
+
+
+def test_read_csv():
+    a = Enumap("a", names="b c e")
+    a.set_types(int, float)
+    csv_file = io.StringIO('e,b,c\r\n"x, y",1,2.5\r\nz,3,4\r\n')
+    assert list(a.read_csv(csv_file)) == [(1, 2.5, "x, y"), (3, 4.0, "z")]
+
+
+def test_read_csv_bad_header():
+    a = Enumap("a", names="b c e")
+    with pytest.raises(KeyError) as ke:
+        list(a.read_csv(io.StringIO("b,c,f\n1,2,3\n")))
+    assert "missing keys {'e'}; invalid keys {'f'}" in str(ke)
+    sparse = SparseEnumap("sparse", names="b c e")
+    with pytest.raises(KeyError) as ke:
+        list(sparse.read_csv(io.StringIO("b,f\n1,2\n")))
+    assert "invalid keys {'f'}" in str(ke)
+
+
+def test_read_csv_header_not_counted():
+    """Validating the header doesn't make a record"""
+    a = Enumap("a", names="b c")
+    a.set_map_factory(lambda items: pytest.fail("map_factory called"))
+    a.enable_stats()
+    assert list(a.read_csv(io.StringIO("c,b\n1,2\n"), casted=False)) == [
+        ("2", "1")]
+    assert a.stats()["calls"] == {"tuple": 1}
+
+
+def test_read_csv_ragged_and_blank_rows():
+    a = SparseEnumap("a", names="b c e")
+    a.set_types(int, float)
+    csv_file = io.StringIO("\ne,b,c\n\nx,1,2.5\n\n")
+    assert list(a.read_csv(csv_file)) == [(1, 2.5, "x")]
+    for rows in ("e,b,c\n1,2,3,4\n", "e,b,c\n1,2\n", "e,b\n1,2,3\n",
+                 "b,c,e\n1,2\n"):
+        with pytest.raises(KeyError) as ke:
+            list(a.read_csv(io.StringIO(rows)))
+        assert "columns, got a row of" in str(ke)
+    with pytest.raises(KeyError) as ke:
+        list(a.read_csv(io.StringIO("b,c\n1,2\n3\n")))
+    assert "header ('b', 'c') has 2 columns, got a row of 1 values" in str(ke)
+    lines = io.StringIO("b c\n1 2\n  \t\n3 4\n")
+    assert list(a.iter_delimited(lines)) == [(1, 2.0, None), (3, 4.0, None)]
+
+
+def test_iter_delimited():
+    a = SparseEnumap("a", names="b c e")
+    a.set_types(int, int)
+    a.set_defaults(c=0)
+    lines = "e b\n" + "".join(f"x{i} {i}\n" for i in range(100))
+    tuples = list(a.iter_delimited(io.StringIO(lines), chunk_size=7))
+    assert tuples == [(i, 0, f"x{i}") for i in range(100)]
+    headless = io.StringIO("1 2 3\n\n4 5 6")
+    assert (list(a.iter_delimited(headless, header=False)) ==
+            [(1, 2, "3"), (4, 5, "6")])
+    crlf = io.StringIO("b,e,c\r\n1,x,2\r\n\r\n3,y,4\r\n", newline="")
+    assert (list(a.iter_delimited(crlf, sep=",", chunk_size=5)) ==
+            [(1, 2, "x"), (3, 4, "y")])
+
+
+def test_binary_codec():
+    a = Enumap("a", names="b c e")
+    a.set_formats("H", "d", e="4s", byte_order=">")
+    assert a.record_format() == ">Hd4s"
+    record = a.tuple(7, 2.5, b"abcd")
+    packed = a.pack(record)
+    assert a.unpack(packed) == record
+    assert type(a.unpack(packed)) is a.tuple_class()
+    buffer = bytearray(len(packed) * 3)
+    for i in range(3):
+        a.pack_into(buffer, i * len(packed), a.tuple(i, i / 2, b"wxyz"))
+    assert (list(a.iter_unpack(buffer)) ==
+            [(i, i / 2, b"wxyz") for i in range(3)])
+
+
+def test_binary_formats_from_types():
+    class A(Enumap):
+        b: int = auto()
+        c: float = auto()
+        e = auto()
+
+    with pytest.raises(KeyError) as ke:
+        A.record_struct()
+    assert "missing keys {'e'}" in str(ke)
+    A.set_types(int, float, bool)
+    assert A.record_format() == "<qd?"
+    with pytest.raises(ValueError):
+        A.set_formats("q", "2d", "?")
+
+
+def test_record_file(tmpdir):
+    a = Enumap("a", names="b c")
+    a.set_formats("i", "d")
+    path = str(tmpdir.join("records.bin"))
+    with open(path, "wb") as records_file:
+        assert a.write_records(records_file,
+                               (a.tuple(i, i / 4) for i in range(10))) == 10
+    with a.open_records(path) as records:
+        assert len(records) == 10
+        assert records[3] == (3, 0.75)
+        assert type(records[-1]) is a.tuple_class()
+        assert records[-1] == (9, 2.25)
+        assert records[2:5] == [(i, i / 4) for i in range(2, 5)]
+        assert records[::4] == [(0, 0.0), (4, 1.0), (8, 2.0)]
+        assert list(records) == [(i, i / 4) for i in range(10)]
+        with pytest.raises(IndexError):
+            records[10]
+    with a.open_records(path) as records:
+        iterator = iter(records)
+        assert next(iterator) == (0, 0.0)
+
+
+def test_record_file_schema_drift(tmpdir):
+    a = Enumap("a", names="b c")
+    a.set_formats("i", "d")
+    path = str(tmpdir.join("records.bin"))
+    with open(path, "wb") as records_file:
+        a.write_records(records_file, [(1, 2.0)])
+    b = Enumap("a", names="c b")
+    b.set_formats("i", "d")
+    with pytest.raises(KeyError) as ke:
+        b.open_records(path)
+    assert "file has keys ('b', 'c')" in str(ke)
+    a.set_formats("i", "f")
+    with pytest.raises(ValueError):
+        a.open_records(path)
+
+
+def test_record():
+    a = Enumap("a", names="b c e")
+    record = a.record(1, 2, 3, e=33)
+    assert type(record) is a.record_class()
+    assert list(record) == [1, 2, 33]
+    record.c = 22
+    assert record == a.record(1, 22, 33)
+    assert repr(record) == "a_record(b=1, c=22, e=33)"
+    with pytest.raises(AttributeError):
+        record.f = 1
+    with pytest.raises(KeyError):
+        a.record(1, 2)
+    with pytest.raises(ValueError):
+        Enumap("b", ["class", "x"]).record_class()
+
+
+def test_sparse_record_defaults():
+    """SparseEnumap defaults are baked into record_class's __init__"""
+    a = SparseEnumap("a", names="b c e")
+    a.set_types(int, int)
+    assert a.record_class()(1) == a.record(1) == a.record(1, None, None)
+    a.set_defaults(e="x")
+    assert a.record_class()(1) == a.record_casted("1") == a.record(1, e="x")
+    assert (a.records([["1", "2"]], casted=True, lazy=False) ==
+            [a.record(1, 2, "x")])
+
+
+def test_tuples_parallel():
+    a = SparseEnumap("a", names="b c e")
+    a.set_types(to_int, float)
+    a.set_defaults(e="x")
+    rows = [(str(i), str(i / 2)) for i in range(1000)]
+    expected = [(i, i / 2, "x") for i in range(1000)]
+    tuples = list(a.tuples_parallel(rows, chunk_size=64, max_workers=2))
+    assert tuples == expected
+    assert type(tuples[0]) is a.tuple_class()
+    unordered = a.tuples_parallel(rows, chunk_size=64, ordered=False,
+                                  max_workers=2)
+    assert sorted(unordered) == expected
+
+
+def test_tuples_parallel_type_cast_exception():
+    a = Enumap("a", names="b c")
+    a.set_types(int, int)
+    rows = [("1", "2")] * 300 + [("1", "two")]
+    with pytest.raises(TypeCastError) as e:
+        list(a.tuples_parallel(rows, chunk_size=100, max_workers=2))
+    assert e.value.row == 300
+    assert e.value.key == "c"
+
+
+def run_coroutine(coroutine):
+    """Like `asyncio.run`, which needs Python 3.7"""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_aiter_records():
+    a = Enumap("a", names="b c")
+    a.set_types(int, float)
+    data = b"".join(b"%d,%d.5\r\n" % (i, i) for i in range(500))
+
+    async def read_records(executor_threshold):
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return [record async for record in a.aiter_records(
+            reader, sep=",", chunk_size=100,
+            executor_threshold=executor_threshold)]
+
+    expected = [(i, i + 0.5) for i in range(500)]
+    assert run_coroutine(read_records(1000)) == expected
+    assert run_coroutine(read_records(2)) == expected
+
+
+def test_aiter_records_type_cast_exception():
+    a = Enumap("a", names="b c")
+    a.set_types(int, int)
+
+    async def read_records():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"1 2\n3 4\n5 six")
+        reader.feed_eof()
+        return [record async for record in a.aiter_records(reader)]
+
+    with pytest.raises(TypeCastError) as e:
+        run_coroutine(read_records())
+    assert e.value.row == 2
+
+
+def test_aiter_records_blank_lines():
+    a = Enumap("a", names="b c")
+
+    async def read_records():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"1 2\r\n\r\n \t\n3 4\n")
+        reader.feed_eof()
+        return [record async for record in a.aiter_records(reader)]
+
+    assert run_coroutine(read_records()) == [("1", "2"), ("3", "4")]
+
+
+def test_stats():
+    a = Enumap("a", names="b c e")
+    a.set_types(int, int)
+    assert a.stats() is None
+    a.tuple(1, 2, 3)
+    a.enable_stats()
+    a.tuple(1, 2, 3)
+    a.map(1, 2, e=3)
+    a.tuple_casted("1", "2", "3")
+    with pytest.raises(TypeCastError):
+        a.tuple_casted("1", "two", "3")
+    with pytest.raises(KeyError):
+        a.tuple(1, 2, 3, 4)
+    stats = a.stats()
+    assert stats["calls"] == dict(tuple=2, map=1, tuple_casted=2)
+    assert stats["fast_path"] == 2
+    assert stats["fallback"] == 1
+    assert set(stats["cast_seconds"]) == {"b", "c"}
+    assert stats["cast_errors"] == dict(c=1)
+    other_a = Enumap("a", names="b")
+    other_a.enable_stats()
+    assert collect_stats()[a] == stats
+    assert collect_stats()[other_a]["calls"] == {}
+    other_a.disable_stats()
+    a.disable_stats()
+    a.tuple(1, 2, 3)
+    assert a.stats() is None
+    sparse = SparseEnumap("sparse", names="b c")
+    sparse.enable_stats()
+    sparse.tuple(1)
+    sparse.tuple(1, 2)
+    assert (sparse.stats()["fast_path"], sparse.stats()["fallback"]) == (1, 1)
+
+
+def test_set_types_and_defaults_stay_lazy():
+    a = SparseEnumap("a", names="b c d")
+    a.set_types(int, None, d=float)
+    a.set_defaults(1, d=2.0)
+    a.set_defaults(c="x")
+    assert a.types() == {"b": int, "d": float}
+    assert a.defaults() == {"b": 1, "c": "x", "d": 2.0}
+    assert "_Enumap__map_maker" not in vars(a)
+    with pytest.raises(KeyError) as ke:
+        a.set_types(int, int, int, int)
+    assert "expected 3 arguments, got 4" in str(ke)
+    with pytest.raises(KeyError) as ke:
+        a.set_defaults(e=1)
+    assert "invalid keys {'e'}" in str(ke)
+
+
+def test_converter():
+    v1 = Enumap("v1", names="index cost due")
+    v2 = SparseEnumap("v2", names="due_on index currency")
+    v2.set_defaults(currency="USD")
+    upgrade = v2.converter(v1, rename={"due": "due_on"})
+    record = upgrade(v1.tuple(1, 9.99, "2017-09-01"))
+    assert record == ("2017-09-01", 1, "USD")
+    assert type(record) is v2.tuple_class()
+    assert (list(upgrade.many([(1, 2, 3), (4, 5, 6)])) ==
+            [(3, 1, "USD"), (6, 4, "USD")])
+    narrow = Enumap("narrow", names="cost")
+    assert narrow.converter(v1)((1, 2, 3)) == (2,)
+    assert v2.converter(narrow, fill=0)((5,)) == (0, 0, 0)
+    for bad_length in ((1, 2), (1, 2, 3, 4, 5)):
+        with pytest.raises(KeyError) as ke:
+            upgrade(bad_length)
+        assert "doesn't match keys ('index', 'cost', 'due')" in str(ke)
+
+
+def test_converter_bad_keys():
+    v1 = Enumap("v1", names="index cost due")
+    v2 = Enumap("v2", names="due_on index")
+    with pytest.raises(KeyError) as ke:
+        v2.converter(v1)
+    assert "missing keys {'due_on'} in v1" in str(ke)
+    with pytest.raises(KeyError) as ke:
+        v2.converter(v1, rename={"dew": "due_on"})
+    assert "invalid keys {'dew'}" in str(ke)
+    with pytest.raises(KeyError) as ke:
+        v2.converter(v1, rename={"cost": "index", "due": "due_on"})
+    assert "more than one v1 key for keys {'index'}" in str(ke)
+
+
 def test_names():
     assert list(Enumap("a", names="b c e").names()) == ["b", "c", "e"]
 
 
+def test_name_lookups():
+    a = Enumap("a", names="b c e")
+    assert a.name_set() == frozenset("bce")
+    assert [a.index_of(name) for name in a.names()] == [0, 1, 2]
+    with pytest.raises(KeyError) as ke:
+        a.index_of("f")
+    assert "invalid key 'f'" in str(ke)
+
+
 def test_tuple_class():
     a = Enumap("a", names="b c e")
     assert a.tuple_class()._fields == ("b", "c", "e")
@@ -113,6 +863,15 @@ def test_sparse_defaults():
     assert a.tuple(**a.defaults()) == (None, "WONK", 0, None)
 
 
+def test_sparse_defaults_after_use():
+    """Check that constructors pick up defaults set after they're used"""
+    a = SparseEnumap("a", names="b c d")
+    assert a.tuple(1) == (1, None, None)
+    a.set_defaults(d=0)
+    assert a.tuple(1) == (1, None, 0)
+    assert a.map(c=2) == OrderedDict([("b", None), ("c", 2), ("d", 0)])
+
+
 def test_sparse_tuple():
     a = SparseEnumap("a", names="b c d e")
     a.set_defaults(c="WONK", d=0)